@@ -0,0 +1,55 @@
+"""add group_question_stats aggregate table
+
+Revision ID: a7c3d9e1f2b4
+Revises: f1a2b3c4d5e6
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3d9e1f2b4'
+down_revision = 'f1a2b3c4d5e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('group_question_stats',
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('question_code', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('sum', sa.Float(), nullable=False),
+        sa.Column('sum_squares', sa.Float(), nullable=False),
+        sa.Column('min', sa.Float(), nullable=True),
+        sa.Column('max', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+        sa.PrimaryKeyConstraint('group_id', 'question_code'),
+        # main.py's create_all may already have created it (empty) on startup
+        if_not_exists=True
+    )
+
+    # Backfill from existing answers (same query as `manage.py rebuild-stats`);
+    # overwrites the partial rows the app may have written since that startup
+    op.execute(
+        """
+        INSERT INTO group_question_stats (group_id, question_code, count, sum, sum_squares, min, max)
+        SELECT l.group_id, a.question_code, count(a.numeric_value), sum(a.numeric_value),
+               sum(a.numeric_value * a.numeric_value), min(a.numeric_value), max(a.numeric_value)
+        FROM survey_answers a
+        JOIN survey_submissions s ON s.id = a.submission_id
+        JOIN survey_links l ON l.id = s.survey_link_id
+        WHERE a.numeric_value IS NOT NULL AND l.group_id IS NOT NULL
+        GROUP BY l.group_id, a.question_code
+        ON CONFLICT (group_id, question_code) DO UPDATE SET
+            count = EXCLUDED.count, sum = EXCLUDED.sum, sum_squares = EXCLUDED.sum_squares,
+            min = EXCLUDED.min, max = EXCLUDED.max, updated_at = now()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('group_question_stats')
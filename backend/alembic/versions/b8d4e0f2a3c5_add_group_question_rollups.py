@@ -0,0 +1,59 @@
+"""add group_question_rollups time-bucketed aggregates
+
+Revision ID: b8d4e0f2a3c5
+Revises: a7c3d9e1f2b4
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4e0f2a3c5'
+down_revision = 'a7c3d9e1f2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('group_question_rollups',
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('question_code', sa.String(), nullable=False),
+        sa.Column('granularity', sa.String(), nullable=False),
+        sa.Column('bucket_start', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('sum', sa.Float(), nullable=False),
+        sa.Column('sum_squares', sa.Float(), nullable=False),
+        sa.Column('min', sa.Float(), nullable=True),
+        sa.Column('max', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+        sa.PrimaryKeyConstraint('group_id', 'question_code', 'granularity', 'bucket_start'),
+        # main.py's create_all may already have created it on startup
+        if_not_exists=True
+    )
+
+    # Backfill both granularities from existing answers, overwriting rows written since then
+    for granularity in ('day', 'week'):
+        op.execute(
+            f"""
+            INSERT INTO group_question_rollups
+                (group_id, question_code, granularity, bucket_start, count, sum, sum_squares, min, max)
+            SELECT l.group_id, a.question_code, '{granularity}',
+                   date(date_trunc('{granularity}', timezone('UTC', s.submitted_at))) AS bucket_start,
+                   count(a.numeric_value), sum(a.numeric_value), sum(a.numeric_value * a.numeric_value),
+                   min(a.numeric_value), max(a.numeric_value)
+            FROM survey_answers a
+            JOIN survey_submissions s ON s.id = a.submission_id
+            JOIN survey_links l ON l.id = s.survey_link_id
+            WHERE a.numeric_value IS NOT NULL AND l.group_id IS NOT NULL
+            GROUP BY l.group_id, a.question_code, bucket_start
+            ON CONFLICT (group_id, question_code, granularity, bucket_start) DO UPDATE SET
+                count = EXCLUDED.count, sum = EXCLUDED.sum, sum_squares = EXCLUDED.sum_squares,
+                min = EXCLUDED.min, max = EXCLUDED.max
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('group_question_rollups')
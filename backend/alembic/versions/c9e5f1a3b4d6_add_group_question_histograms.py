@@ -0,0 +1,36 @@
+"""add group_question_histograms value counts
+
+Revision ID: c9e5f1a3b4d6
+Revises: b8d4e0f2a3c5
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e5f1a3b4d6'
+down_revision = 'b8d4e0f2a3c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('group_question_histograms',
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('question_code', sa.String(), nullable=False),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+        sa.PrimaryKeyConstraint('group_id', 'question_code', 'value'),
+        # main.py's create_all may already have created it on startup
+        if_not_exists=True
+    )
+    # Non-integer answers are binned in Python, so the backfill is
+    # `python manage.py rebuild-stats` rather than SQL here. Running it after
+    # this upgrade is required: until then distributions only cover new answers.
+
+
+def downgrade() -> None:
+    op.drop_table('group_question_histograms')
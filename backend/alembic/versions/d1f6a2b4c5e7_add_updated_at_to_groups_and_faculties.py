@@ -0,0 +1,28 @@
+"""add updated_at to groups and faculties
+
+Revision ID: d1f6a2b4c5e7
+Revises: c9e5f1a3b4d6
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f6a2b4c5e7'
+down_revision = 'c9e5f1a3b4d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Part of the ETag of statistics responses (names are in the payload)
+    for table in ('faculties', 'groups'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = created_at WHERE created_at IS NOT NULL")
+
+
+def downgrade() -> None:
+    op.drop_column('groups', 'updated_at')
+    op.drop_column('faculties', 'updated_at')
@@ -0,0 +1,30 @@
+"""add is_public to survey_links
+
+Revision ID: e2a7b3c5d6f8
+Revises: d1f6a2b4c5e7
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7b3c5d6f8'
+down_revision = 'd1f6a2b4c5e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('survey_links', sa.Column('is_public', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+    # At most one public link per group
+    op.create_index('uq_survey_links_public_group', 'survey_links', ['group_id'], unique=True,
+                    postgresql_where=sa.text('is_public'))
+    # Existing one-off links from /submit-group are folded by
+    # `python manage.py fold-public-links`.
+
+
+def downgrade() -> None:
+    op.drop_index('uq_survey_links_public_group', table_name='survey_links')
+    op.drop_column('survey_links', 'is_public')
@@ -0,0 +1,30 @@
+"""index foreign keys used by group statistics joins
+
+Revision ID: f1a2b3c4d5e6
+Revises: e3b1c9f4a7b2
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a2b3c4d5e6'
+down_revision = 'e3b1c9f4a7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # survey_answers -> survey_submissions -> survey_links(group_id) is the path of
+    # every per-group aggregate; none of these foreign keys were indexed.
+    # Tables created by create_all() on newer installs already have them.
+    op.create_index('ix_survey_links_group_id', 'survey_links', ['group_id'], if_not_exists=True)
+    op.create_index('ix_survey_submissions_survey_link_id', 'survey_submissions', ['survey_link_id'], if_not_exists=True)
+    op.create_index('ix_survey_answers_submission_id', 'survey_answers', ['submission_id'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_survey_answers_submission_id', table_name='survey_answers', if_exists=True)
+    op.drop_index('ix_survey_submissions_survey_link_id', table_name='survey_submissions', if_exists=True)
+    op.drop_index('ix_survey_links_group_id', table_name='survey_links', if_exists=True)
@@ -0,0 +1,38 @@
+"""add import_batches ledger
+
+Revision ID: f3b8c4d6e7a9
+Revises: e2a7b3c5d6f8
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8c4d6e7a9'
+down_revision = 'e2a7b3c5d6f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('import_batches',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_sha256', sa.String(length=64), nullable=False),
+        sa.Column('source_name', sa.String(), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('submissions', sa.Integer(), nullable=False),
+        sa.Column('answers', sa.Integer(), nullable=False),
+        sa.Column('imported_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('source_sha256'),
+        # main.py's create_all may already have created it on startup
+        if_not_exists=True
+    )
+    op.create_index(op.f('ix_import_batches_id'), 'import_batches', ['id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_import_batches_id'), table_name='import_batches')
+    op.drop_table('import_batches')
@@ -1,16 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select, func
+from typing import Optional
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-
-from core.database import get_db
-from app.models import Group, SurveyLink, SurveySubmission
-from app.schemas import FacultyCreate, FacultyUpdate, GroupCreate, GroupUpdate
-from services.survey_service import get_group_statistics
+from sqlalchemy.orm import joinedload
+
+from core.database import get_async_db, get_pool_stats
+from core.rate_limit import get_rate_limit_metrics
+from core.conditional import validator_headers, is_not_modified, not_modified_response
+from app.models import Group, Faculty, GroupQuestionRollup, GroupQuestionHistogram, GroupQuestionStats
+from app.schemas import FacultyCreate, FacultyUpdate, GroupCreate, GroupUpdate, TrendGranularity, ComparisonBaseline
+from services.survey_service import (
+    count_group_submissions, get_statistics_by_group, get_groups_overview,
+    cached_statistics, get_statistics_cache_metrics, get_statistics_validator
+)
 from services.faculty_service import (
     create_faculty, get_faculty, get_faculties, update_faculty, delete_faculty,
     create_group, get_group, get_groups, update_group, delete_group
 )
-from services.auth_service import get_admin_user
+from services.statistics_service import get_trend
+from services.distribution_service import get_distribution
+from services.analytics_service import load_group_matrix, compare_groups, compare_faculties
+from services.auth_service import get_admin_user, get_auth_metrics
+from services.link_service import link_cache
+from services.ingestion_service import get_ingestion_metrics
 
 router = APIRouter()
 
@@ -18,16 +32,18 @@ router = APIRouter()
 async def get_all_faculties(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin = Depends(get_admin_user)
 ):
     """Get all faculties"""
-    faculties = get_faculties(db, skip, limit)
+    faculties = await get_faculties(db, skip, limit)
 
     result = []
     for faculty in faculties:
         # Get group count
-        group_count = db.query(Group).filter(Group.faculty_id == faculty.id).count()
+        group_count = await db.scalar(
+            select(func.count(Group.id)).where(Group.faculty_id == faculty.id)
+        )
 
         result.append({
             "id": faculty.id,
@@ -42,12 +58,12 @@ async def get_all_faculties(
 @router.post("/faculties")
 async def create_faculty_endpoint(
     faculty_data: FacultyCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin = Depends(get_admin_user)
 ):
     """Create new faculty"""
     try:
-        faculty = create_faculty(db, faculty_data)
+        faculty = await create_faculty(db, faculty_data)
         return {
             "id": faculty.id,
             "name": faculty.name,
@@ -56,17 +72,17 @@ async def create_faculty_endpoint(
         }
     except IntegrityError as e:
         # Likely duplicate faculty name
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Faculty with this name already exists")
 
 @router.get("/faculties/{faculty_id}")
 async def get_faculty_endpoint(
     faculty_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin = Depends(get_admin_user)
 ):
     """Get faculty by ID"""
-    faculty = get_faculty(db, faculty_id)
+    faculty = await get_faculty(db, faculty_id)
     if not faculty:
         raise HTTPException(status_code=404, detail="Faculty not found")
 
@@ -81,11 +97,11 @@ async def get_faculty_endpoint(
 async def update_faculty_endpoint(
     faculty_id: int,
     faculty_data: FacultyUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin = Depends(get_admin_user)
 ):
     """Update faculty"""
-    faculty = update_faculty(db, faculty_id, faculty_data)
+    faculty = await update_faculty(db, faculty_id, faculty_data)
     if not faculty:
         raise HTTPException(status_code=404, detail="Faculty not found")
 
@@ -99,11 +115,11 @@ async def update_faculty_endpoint(
 @router.delete("/faculties/{faculty_id}")
 async def delete_faculty_endpoint(
     faculty_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin = Depends(get_admin_user)
 ):
     """Delete faculty"""
-    success = delete_faculty(db, faculty_id)
+    success = await delete_faculty(db, faculty_id)
     if not success:
         raise HTTPException(status_code=404, detail="Faculty not found")
 
@@ -113,20 +129,16 @@ async def delete_faculty_endpoint(
 async def get_all_groups(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin = Depends(get_admin_user)
 ):
     """Get all groups"""
-    groups = get_groups(db, skip, limit)
+    groups = await get_groups(db, skip, limit)
 
     result = []
     for group in groups:
         # Get submission count
-        links = db.query(SurveyLink).filter(SurveyLink.group_id == group.id).all()
-        link_ids = [link.id for link in links]
-        submission_count = db.query(SurveySubmission).filter(
-            SurveySubmission.survey_link_id.in_(link_ids)
-        ).count()
+        submission_count = await count_group_submissions(db, group.id)
 
         result.append({
             "id": group.id,
@@ -143,16 +155,16 @@ async def get_all_groups(
 @router.post("/groups")
 async def create_group_endpoint(
     group_data: GroupCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin = Depends(get_admin_user)
 ):
     """Create new group"""
     # Verify faculty exists
-    faculty = get_faculty(db, group_data.faculty_id)
+    faculty = await get_faculty(db, group_data.faculty_id)
     if not faculty:
         raise HTTPException(status_code=404, detail="Faculty not found")
 
-    group = create_group(db, group_data)
+    group = await create_group(db, group_data)
     return {
         "id": group.id,
         "name": group.name,
@@ -165,11 +177,11 @@ async def create_group_endpoint(
 @router.get("/groups/{group_id}")
 async def get_group_endpoint(
     group_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin = Depends(get_admin_user)
 ):
     """Get group by ID"""
-    group = get_group(db, group_id)
+    group = await get_group(db, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
@@ -186,17 +198,17 @@ async def get_group_endpoint(
 async def update_group_endpoint(
     group_id: int,
     group_data: GroupUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin = Depends(get_admin_user)
 ):
     """Update group"""
     # Verify faculty exists if faculty_id is being updated
     if group_data.faculty_id is not None:
-        faculty = get_faculty(db, group_data.faculty_id)
+        faculty = await get_faculty(db, group_data.faculty_id)
         if not faculty:
             raise HTTPException(status_code=404, detail="Faculty not found")
 
-    group = update_group(db, group_id, group_data)
+    group = await update_group(db, group_id, group_data)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
@@ -212,11 +224,11 @@ async def update_group_endpoint(
 @router.delete("/groups/{group_id}")
 async def delete_group_endpoint(
     group_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin = Depends(get_admin_user)
 ):
     """Delete group"""
-    success = delete_group(db, group_id)
+    success = await delete_group(db, group_id)
     if not success:
         raise HTTPException(status_code=404, detail="Group not found")
 
@@ -224,38 +236,43 @@ async def delete_group_endpoint(
 
 @router.get("/statistics/all")
 async def get_all_statistics(
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get aggregated statistics for all groups"""
-    groups = db.query(Group).all()
+    """Get aggregated statistics for all groups (conditional on ETag / Last-Modified)"""
+    validator = await get_statistics_validator(db)
+    headers = validator_headers(*validator)
+    if is_not_modified(request, *validator):
+        return not_modified_response(headers)
+
+    response.headers.update(headers)
+    return await cached_statistics("all", None, lambda: _build_all_statistics(db), etag=headers["ETag"])
+
+async def _build_all_statistics(db: AsyncSession) -> dict:
+    # Two set-based queries: groups with submission counts, and per-group question aggregates
+    groups = await get_groups_overview(db)
+    stats_by_group = await get_statistics_by_group(db)
 
     group_stats = []
     faculty_map = {}
 
     for group in groups:
-        # Get statistics
-        stats = get_group_statistics(db, group.id)
-
-        # Get submission count
-        links = db.query(SurveyLink).filter(SurveyLink.group_id == group.id).all()
-        link_ids = [link.id for link in links]
-        total_submissions = db.query(SurveySubmission).filter(
-            SurveySubmission.survey_link_id.in_(link_ids)
-        ).count()
+        total_submissions = group.total_submissions
 
         group_stat = {
             "group_id": group.id,
             "group_name": group.name,
-            "faculty": group.faculty.name if group.faculty else None,
+            "faculty": group.faculty_name,
             "year": group.year,
             "total_submissions": total_submissions,
-            "question_stats": stats
+            "question_stats": stats_by_group.get(group.id, [])
         }
 
         group_stats.append(group_stat)
 
         # Group by faculty
-        faculty_name = group.faculty.name if group.faculty else "Не указан"
+        faculty_name = group.faculty_name or "Не указан"
         if faculty_name not in faculty_map:
             faculty_map[faculty_name] = {
                 "total_submissions": 0,
@@ -290,42 +307,188 @@ async def get_all_statistics(
         "faculties": faculty_stats
     }
 
-@router.get("/statistics/faculty/{faculty_name}")
-async def get_faculty_statistics(
-    faculty_name: str,
-    db: Session = Depends(get_db)
+@router.get("/statistics/trend")
+async def get_statistics_trend(
+    granularity: TrendGranularity = TrendGranularity.WEEK,
+    faculty_id: Optional[int] = None,
+    group_id: Optional[int] = None,
+    year: Optional[int] = None,
+    question_code: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db),
+    admin = Depends(get_admin_user)
 ):
-    """Get statistics for specific faculty"""
-    groups = db.query(Group).filter(Group.faculty == faculty_name).all()
+    """Get per-question time series for the university, a faculty, a course year or a group"""
+    criteria = []
+    if faculty_id is not None:
+        criteria.append(Group.faculty_id == faculty_id)
+    if group_id is not None:
+        criteria.append(Group.id == group_id)
+    if year is not None:
+        criteria.append(Group.year == year)
+    if question_code:
+        criteria.append(GroupQuestionRollup.question_code == question_code)
+
+    series = await get_trend(db, granularity.value, *criteria, since=since, until=until)
 
-    if not groups:
-        raise HTTPException(status_code=404, detail="Faculty not found")
+    return {
+        "granularity": granularity.value,
+        "faculty_id": faculty_id,
+        "group_id": group_id,
+        "year": year,
+        "series": series
+    }
 
-    group_stats = []
-    total_submissions = 0
+@router.get("/statistics/distribution")
+async def get_statistics_distribution(
+    faculty_id: Optional[int] = None,
+    group_id: Optional[int] = None,
+    year: Optional[int] = None,
+    question_code: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    admin = Depends(get_admin_user)
+):
+    """Get per-question percentiles for the university, a faculty, a course year or a group"""
+    criteria = []
+    if faculty_id is not None:
+        criteria.append(Group.faculty_id == faculty_id)
+    if group_id is not None:
+        criteria.append(Group.id == group_id)
+    if year is not None:
+        criteria.append(Group.year == year)
+    if question_code:
+        criteria.append(GroupQuestionHistogram.question_code == question_code)
 
-    for group in groups:
-        stats = get_group_statistics(db, group.id)
+    return {
+        "faculty_id": faculty_id,
+        "group_id": group_id,
+        "year": year,
+        "questions": await get_distribution(db, *criteria)
+    }
+
+@router.get("/statistics/compare")
+async def get_statistics_compare(
+    baseline: ComparisonBaseline = ComparisonBaseline.FACULTY,
+    faculty_id: Optional[int] = None,
+    year: Optional[int] = None,
+    question_code: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    admin = Depends(get_admin_user)
+):
+    """Compare groups per question: CI, z-score against the faculty or university, and rank"""
+    criteria = []
+    if question_code:
+        criteria.append(GroupQuestionStats.question_code == question_code)
+    if baseline == ComparisonBaseline.FACULTY and faculty_id is not None:
+        # A faculty baseline only needs that faculty's groups
+        criteria.append(Group.faculty_id == faculty_id)
+
+    matrix = await load_group_matrix(db, *criteria)
 
-        links = db.query(SurveyLink).filter(SurveyLink.group_id == group.id).all()
-        link_ids = [link.id for link in links]
-        submissions = db.query(SurveySubmission).filter(
-            SurveySubmission.survey_link_id.in_(link_ids)
-        ).count()
+    return {
+        "baseline": baseline.value,
+        "faculty_id": faculty_id,
+        "year": year,
+        "questions": matrix.questions,
+        "groups": compare_groups(matrix, baseline.value, faculty_id=faculty_id, year=year)
+    }
+
+@router.get("/statistics/compare/faculties")
+async def get_statistics_compare_faculties(
+    year: Optional[int] = None,
+    question_code: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    admin = Depends(get_admin_user)
+):
+    """Compare faculties per question: CI, z-score against the university, and rank"""
+    criteria = []
+    if year is not None:
+        criteria.append(Group.year == year)
+    if question_code:
+        criteria.append(GroupQuestionStats.question_code == question_code)
 
-        total_submissions += submissions
+    matrix = await load_group_matrix(db, *criteria)
 
-        group_stats.append({
+    return {
+        "baseline": ComparisonBaseline.UNIVERSITY.value,
+        "year": year,
+        "questions": matrix.questions,
+        "faculties": compare_faculties(matrix)
+    }
+
+async def _build_faculty_statistics(db: AsyncSession, faculty: Faculty, year: Optional[int]) -> dict:
+    criteria = [Group.faculty_id == faculty.id]
+    if year is not None:
+        criteria.append(Group.year == year)
+
+    # Same two set-based queries as /statistics/all, scoped to the faculty
+    groups = await get_groups_overview(db, *criteria)
+    stats_by_group = await get_statistics_by_group(db, *criteria)
+
+    group_stats = [
+        {
             "group_id": group.id,
             "group_name": group.name,
             "year": group.year,
-            "total_submissions": submissions,
-            "question_stats": stats
-        })
+            "total_submissions": group.total_submissions,
+            "question_stats": stats_by_group.get(group.id, [])
+        }
+        for group in groups
+    ]
 
     return {
-        "faculty": faculty_name,
-        "total_submissions": total_submissions,
+        "faculty_id": faculty.id,
+        "faculty": faculty.name,
+        "year": year,
+        "total_submissions": sum(group.total_submissions for group in groups),
         "total_groups": len(groups),
         "group_stats": group_stats
     }
+
+@router.get("/statistics/faculties/{faculty_id}")
+async def get_faculty_statistics_by_id(
+    faculty_id: int,
+    year: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    admin = Depends(get_admin_user)
+):
+    """Get statistics for a faculty's groups, optionally for one course year"""
+    faculty = await get_faculty(db, faculty_id)
+    if not faculty:
+        raise HTTPException(status_code=404, detail="Faculty not found")
+
+    return await cached_statistics(
+        "faculty", (faculty.id, year), lambda: _build_faculty_statistics(db, faculty, year)
+    )
+
+@router.get("/statistics/faculty/{faculty_name}")
+async def get_faculty_statistics(
+    faculty_name: str,
+    year: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get statistics for specific faculty"""
+    # faculties.name is unique and indexed
+    result = await db.execute(select(Faculty).where(Faculty.name == faculty_name))
+    faculty = result.scalars().first()
+    if not faculty:
+        raise HTTPException(status_code=404, detail="Faculty not found")
+
+    return await cached_statistics(
+        "faculty", (faculty.id, year), lambda: _build_faculty_statistics(db, faculty, year)
+    )
+
+@router.get("/metrics")
+async def get_metrics(
+    admin = Depends(get_admin_user)
+):
+    """Get in-process cache and connection metrics"""
+    return {
+        "auth": get_auth_metrics(),
+        "database": get_pool_stats(),
+        "statistics_cache": get_statistics_cache_metrics(),
+        "link_cache": link_cache.stats(),
+        "ingestion": get_ingestion_metrics(),
+        "rate_limit": get_rate_limit_metrics()
+    }
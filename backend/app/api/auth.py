@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import RedirectResponse, JSONResponse
 from urllib.parse import urlencode
-import requests
+import httpx
 
 from core.config import settings
-from services.auth_service import get_current_user, keycloak_auth
+from core import http
+from services.auth_service import Principal, get_current_principal
 
 router = APIRouter()
 
@@ -67,7 +68,10 @@ async def keycloak_callback(request: Request):
         print("[auth] Exchanging code for token:", token_url, data.get("redirect_uri"))
     except Exception:
         pass
-    resp = requests.post(token_url, data=data)
+    try:
+        resp = await http.request("POST", token_url, data=data)
+    except httpx.HTTPError as e:
+        return JSONResponse({"error": "Token exchange failed", "details": str(e)}, status_code=502)
     if resp.status_code != 200:
         return JSONResponse({"error": "Token exchange failed", "details": resp.text}, status_code=400)
 
@@ -85,19 +89,11 @@ async def keycloak_callback(request: Request):
 
 
 @router.get("/user")
-async def current_user(user: dict = Depends(get_current_user)):
+async def current_user(principal: Principal = Depends(get_current_principal)):
     """Return current authenticated user info (uses cookie or Authorization header)."""
-    # Extract roles/groups for frontend
-    roles = []
-    try:
-        if keycloak_auth and user:
-            roles = keycloak_auth.get_user_roles(user)
-    except Exception:
-        roles = []
-    try:
-        print("[auth:user] resolved roles:", roles)
-    except Exception:
-        pass
+    # Roles/groups for frontend were resolved once when the token was verified
+    user = principal.claims
+    roles = list(principal.roles)
 
     return {
         "user": {
@@ -105,6 +101,7 @@ async def current_user(user: dict = Depends(get_current_user)):
             "username": user.get("preferred_username") or user.get("username") or user.get("email"),
             "name": user.get("name") or user.get("preferred_username"),
             "roles": roles,
+            "curator_group_ids": sorted(principal.curator_group_ids),
             "raw": user
         }
     }
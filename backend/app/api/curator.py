@@ -1,26 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select, func
+from typing import Optional
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
-from core.database import get_db
-from app.models import SurveyLink, SurveySubmission, SurveyAnswer, Group
-from services.survey_service import get_group_statistics
+from core.database import get_async_db
+from core.conditional import validator_headers, is_not_modified, not_modified_response
+from app.models import SurveyLink, SurveySubmission, SurveyAnswer, Group, GroupQuestionRollup, GroupQuestionHistogram
+from app.schemas import TrendGranularity
+from services.survey_service import (
+    get_group_statistics, count_group_submissions, cached_statistics, get_group_validator
+)
+from services.statistics_service import get_trend
+from services.distribution_service import get_distribution
+from services.link_service import survey_link_url
 
 router = APIRouter()
 
+def _faculty_info(group: Group):
+    if not group.faculty:
+        return None
+    return {"id": group.faculty.id, "name": group.faculty.name}
+
 @router.get("/groups")
 async def get_curator_groups(
     # curator = Depends(get_current_curator),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all groups (in production, filtered by curator)"""
-    groups = db.query(Group).all()
+    result = await db.execute(select(Group).options(joinedload(Group.faculty)))
+    groups = result.scalars().all()
 
     result = []
     for group in groups:
         result.append({
             "id": group.id,
             "name": group.name,
-            "faculty": group.faculty,
+            "faculty": _faculty_info(group),
             "year": group.year,
             "created_at": group.created_at
         })
@@ -30,30 +47,53 @@ async def get_curator_groups(
 @router.get("/groups/{group_id}/statistics")
 async def get_group_statistics_route(
     group_id: int,
+    request: Request,
+    response: Response,
     # curator = Depends(get_current_curator),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get statistics for specific group"""
+    """Get statistics for specific group (conditional on ETag / Last-Modified)"""
+    validator = await get_group_validator(db, group_id)
+    if validator is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    headers = validator_headers(*validator)
+    if is_not_modified(request, *validator):
+        return not_modified_response(headers)
+
+    response.headers.update(headers)
+    return await cached_statistics(
+        "group", group_id, lambda: _build_group_statistics(db, group_id), etag=headers["ETag"]
+    )
+
+async def _build_group_statistics(db: AsyncSession, group_id: int) -> dict:
     # Verify group exists
-    group = db.query(Group).filter(Group.id == group_id).first()
+    result = await db.execute(
+        select(Group).options(joinedload(Group.faculty)).where(Group.id == group_id)
+    )
+    group = result.scalars().first()
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
     # Get statistics
-    stats = get_group_statistics(db, group_id)
+    stats = await get_group_statistics(db, group_id)
 
     # Get total submission count
-    links = db.query(SurveyLink).filter(SurveyLink.group_id == group_id).all()
-    link_ids = [link.id for link in links]
-    total_submissions = db.query(SurveySubmission).filter(
-        SurveySubmission.survey_link_id.in_(link_ids)
-    ).count()
-
-    # Get open answers
-    answers = db.query(SurveyAnswer).join(SurveySubmission).filter(
-        SurveySubmission.survey_link_id.in_(link_ids),
-        SurveyAnswer.text_value.isnot(None)
-    ).order_by(SurveyAnswer.created_at.desc()).all()
+    total_submissions = await count_group_submissions(db, group_id)
+
+    # Get open answers (last 50)
+    result = await db.execute(
+        select(SurveyAnswer)
+        .join(SurveySubmission)
+        .join(SurveyLink, SurveyLink.id == SurveySubmission.survey_link_id)
+        .where(
+            SurveyLink.group_id == group_id,
+            SurveyAnswer.text_value.isnot(None)
+        )
+        .order_by(SurveyAnswer.created_at.desc())
+        .limit(50)
+    )
+    answers = result.scalars().all()
 
     open_answers = []
     for answer in answers:
@@ -67,30 +107,81 @@ async def get_group_statistics_route(
     return {
         "group_id": group.id,
         "group_name": group.name,
-        "faculty": group.faculty,
+        "faculty": _faculty_info(group),
         "total_submissions": total_submissions,
         "question_stats": stats,
-        "open_answers": open_answers[:50]  # Limit to last 50
+        "open_answers": open_answers
+    }
+
+@router.get("/groups/{group_id}/trend")
+async def get_group_trend(
+    group_id: int,
+    granularity: TrendGranularity = TrendGranularity.WEEK,
+    question_code: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    # curator = Depends(get_current_curator),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get per-question time series for a group"""
+    group = await db.get(Group, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    criteria = [Group.id == group_id]
+    if question_code:
+        criteria.append(GroupQuestionRollup.question_code == question_code)
+
+    series = await get_trend(db, granularity.value, *criteria, since=since, until=until)
+
+    return {
+        "group_id": group.id,
+        "group_name": group.name,
+        "granularity": granularity.value,
+        "series": series
+    }
+
+@router.get("/groups/{group_id}/distribution")
+async def get_group_distribution(
+    group_id: int,
+    question_code: Optional[str] = None,
+    # curator = Depends(get_current_curator),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get per-question percentiles and value histogram for a group"""
+    group = await db.get(Group, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    criteria = [Group.id == group_id]
+    if question_code:
+        criteria.append(GroupQuestionHistogram.question_code == question_code)
+
+    return {
+        "group_id": group.id,
+        "group_name": group.name,
+        "questions": await get_distribution(db, *criteria)
     }
 
 @router.get("/groups/{group_id}/links")
 async def get_group_links(
     group_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all survey links for a group"""
-    links = db.query(SurveyLink).filter(SurveyLink.group_id == group_id).all()
+    result = await db.execute(select(SurveyLink).where(SurveyLink.group_id == group_id))
+    links = result.scalars().all()
 
     result = []
     for link in links:
-        submission_count = db.query(SurveySubmission).filter(
-            SurveySubmission.survey_link_id == link.id
-        ).count()
+        submission_count = await db.scalar(
+            select(func.count(SurveySubmission.id)).where(SurveySubmission.survey_link_id == link.id)
+        )
 
         result.append({
             "id": link.id,
             "unique_token": link.unique_token,
-            "link_url": f"http://localhost:3000/survey/{link.unique_token}",
+            "link_url": survey_link_url(link.unique_token),
             "created_at": link.created_at,
             "expires_at": link.expires_at,
             "is_active": link.is_active,
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from jinja2 import Template
 
-from core.database import get_db
+from core.database import get_async_db
+from core.conditional import validator_headers, is_not_modified, not_modified_response
 from app.models import Group, SurveyLink, SurveySubmission, SurveyAnswer
-from services.survey_service import get_group_statistics
+from services.survey_service import get_group_statistics, count_group_submissions, get_group_validator
 
 # Словарь перевода показателей на русский язык
 QUESTION_LABELS = {
@@ -25,32 +28,46 @@ router = APIRouter()
 @router.get("/group/{group_id}/report")
 async def generate_group_pdf_report(
     group_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Generate PDF report for a group (returns HTML as fallback)"""
-    # Verify group exists
-    group = db.query(Group).filter(Group.id == group_id).first()
+    validator = await get_group_validator(db, group_id)
+    if validator is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    headers = validator_headers(*validator)
+    if is_not_modified(request, *validator):
+        return not_modified_response(headers)
+
+    result = await db.execute(
+        select(Group).options(joinedload(Group.faculty)).where(Group.id == group_id)
+    )
+    group = result.scalars().first()
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
     # Get statistics
-    stats = get_group_statistics(db, group_id)
+    stats = await get_group_statistics(db, group_id)
 
     # Добавляем русские названия показателей
     for stat in stats:
         stat['question_label'] = QUESTION_LABELS.get(stat['question_code'], stat['question_code'])
-    # Get submission count (and link ids) — needed for fetching open answers below
-    links = db.query(SurveyLink).filter(SurveyLink.group_id == group_id).all()
-    link_ids = [link.id for link in links]
-    total_submissions = db.query(SurveySubmission).filter(
-        SurveySubmission.survey_link_id.in_(link_ids)
-    ).count()
+    # Get submission count
+    total_submissions = await count_group_submissions(db, group_id)
 
     # Get open (text) answers for report
-    open_answers = db.query(SurveyAnswer).join(SurveySubmission).filter(
-        SurveySubmission.survey_link_id.in_(link_ids),
-        SurveyAnswer.text_value.isnot(None)
-    ).order_by(SurveyAnswer.created_at.desc()).all()
+    result = await db.execute(
+        select(SurveyAnswer)
+        .join(SurveySubmission)
+        .join(SurveyLink, SurveyLink.id == SurveySubmission.survey_link_id)
+        .where(
+            SurveyLink.group_id == group_id,
+            SurveyAnswer.text_value.isnot(None)
+        )
+        .order_by(SurveyAnswer.created_at.desc())
+    )
+    open_answers = result.scalars().all()
 
     open_answers_list = []
     for ans in open_answers:
@@ -125,4 +142,4 @@ async def generate_group_pdf_report(
         open_answers=open_answers_list
     )
 
-    return HTMLResponse(content=html_content)
+    return HTMLResponse(content=html_content, headers=headers)
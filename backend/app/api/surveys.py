@@ -1,12 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, contains_eager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator, Optional
+import csv
+import io
+import json
+import math
+import tempfile
 
-from core.database import get_db
-from app.models import Group, SurveyLink, SurveySubmission, Faculty
-from app.schemas import SurveySubmissionCreate, SurveyLinkCreate, SurveyGroupSelection
+from core.config import settings
+from core.database import get_async_db, AsyncSessionLocal
+from app.models import Group, SurveyLink, SurveySubmission
+from app.schemas import (
+    SurveySubmissionCreate, SurveyLinkCreate, SurveyLinkBulkCreate, SurveyLinkUpdate, SurveyGroupSelection
+)
 from services.survey_service import create_submission
-from services.link_service import generate_unique_token
+from services import ingestion_service
+from services.ingestion_service import (
+    IngestionQueueFull, PendingSubmission, RetryableWriteError, allocate_submission_ids, write_batch
+)
+from services.auth_service import Principal, get_link_manager
+from services.link_service import (
+    ResolvedLink, generate_unique_token, resolve_link, get_public_link, invalidate_link, update_survey_link,
+    create_group_links, survey_link_url
+)
 
 router = APIRouter()
 
@@ -55,16 +76,31 @@ async def get_survey_questions():
     """Get list of survey questions"""
     return {"questions": SURVEY_QUESTIONS}
 
+async def _store_submission(db: AsyncSession, link: ResolvedLink, answers) -> int:
+    """Write a validated submission, or queue it in write-behind mode"""
+    if ingestion_service.ingestion_queue is None:
+        return await create_submission(db, link.link_id, link.group_id, link.survey_id, answers)
+
+    # Write-behind: acknowledge now, the batch flusher writes it shortly
+    try:
+        return await ingestion_service.ingestion_queue.enqueue(
+            db, link.link_id, link.group_id, link.survey_id, answers
+        )
+    except IngestionQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many submissions right now, please retry",
+            headers={"Retry-After": "5"}
+        )
+
 @router.post("/submit")
 async def submit_survey(
     submission_data: SurveySubmissionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Submit anonymous survey"""
-    # Verify token
-    link = db.query(SurveyLink).filter(
-        SurveyLink.unique_token == submission_data.unique_token
-    ).first()
+    # Verify token (usually without touching the database)
+    link = await resolve_link(db, submission_data.unique_token)
 
     if not link:
         raise HTTPException(
@@ -78,61 +114,224 @@ async def submit_survey(
             detail="Survey link is inactive"
         )
 
-    if link.expires_at and link.expires_at < datetime.utcnow():
+    if link.is_expired():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Survey link has expired"
         )
 
-    submission = create_submission(db, link.id, submission_data.answers)
+    submission_id = await _store_submission(db, link, submission_data.answers)
 
     return {
         "message": "Survey submitted successfully",
-        "submission_id": submission.id
+        "submission_id": submission_id
     }
 
 @router.post("/submit-group")
 async def submit_survey_by_group(
     submission_data: SurveyGroupSelection,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Submit survey by group selection (for public survey)"""
-    # Verify group exists
-    group = db.query(Group).filter(Group.id == submission_data.group_id).first()
-    if not group:
+    # All anonymous submissions of a group go through its one public link
+    link = await get_public_link(db, submission_data.group_id)
+    if not link:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Group not found"
         )
 
-    # Create a temporary survey link for this submission
-    unique_token = generate_unique_token()
-    survey_link = SurveyLink(
-        unique_token=unique_token,
-        group_id=submission_data.group_id,
-        is_active=True,
-        expires_at=datetime.utcnow() + timedelta(hours=1)  # Expire in 1 hour
-    )
+    if not link.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Survey is closed for this group"
+        )
 
-    db.add(survey_link)
-    db.flush()
+    if link.is_expired():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Survey link has expired"
+        )
 
-    # Create submission
-    submission = create_submission(db, survey_link.id, submission_data.answers)
+    submission_id = await _store_submission(db, link, submission_data.answers)
 
     return {
         "message": "Survey submitted successfully",
-        "submission_id": submission.id
+        "submission_id": submission_id
     }
 
+# A longer NDJSON line is rejected without being held in memory
+MAX_BATCH_LINE_BYTES = 64 * 1024
+MAX_BATCH_BODY_BYTES = 64 * 1024 * 1024
+# Batch bodies move from memory to a temporary file past this size
+BATCH_SPOOL_BYTES = 1024 * 1024
+
+async def _spool_body(request: Request):
+    """Read the whole body into a spooled temporary file.
+
+    This has to finish before the response starts: StreamingResponse
+    listens for client disconnects on the same receive channel, and
+    reading the body concurrently with it loses chunks.
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES)
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_BATCH_BODY_BYTES:
+            body.close()
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Batch body exceeds {MAX_BATCH_BODY_BYTES} bytes"
+            )
+        body.write(chunk)
+    body.seek(0)
+    return body
+
+def _ndjson_lines(body) -> Iterator[tuple]:
+    """(line number, bytes or None if too long) for each non-empty line of a spooled body"""
+    number = 0
+    while True:
+        line = body.readline(MAX_BATCH_LINE_BYTES + 1)
+        if not line:
+            break
+        number += 1
+        if len(line) > MAX_BATCH_LINE_BYTES and not line.endswith(b"\n"):
+            # Discard the rest of the line without buffering it
+            while line and not line.endswith(b"\n"):
+                line = body.readline(MAX_BATCH_LINE_BYTES + 1)
+            yield number, None
+        elif line.strip():
+            yield number, line
+
+async def _validate_batch_record(db: AsyncSession, raw: bytes):
+    """Resolve one NDJSON record to (link, answers), or raise ValueError with the reason"""
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        raise ValueError("Invalid JSON")
+    if not isinstance(data, dict):
+        raise ValueError("Record must be a JSON object")
+
+    try:
+        if "unique_token" in data:
+            record = SurveySubmissionCreate.model_validate(data)
+            link = await resolve_link(db, record.unique_token)
+            if not link:
+                raise ValueError("Invalid survey link")
+            if not link.is_active:
+                raise ValueError("Survey link is inactive")
+            if link.is_expired():
+                raise ValueError("Survey link has expired")
+        else:
+            record = SurveyGroupSelection.model_validate(data)
+            link = await get_public_link(db, record.group_id)
+            if not link:
+                raise ValueError("Group not found")
+            if not link.is_active:
+                raise ValueError("Survey is closed for this group")
+            if link.is_expired():
+                raise ValueError("Survey link has expired")
+    except ValidationError as e:
+        raise ValueError("; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+        ))
+    return link, record.answers
+
+async def _process_batch(body, rate_limit: Optional[tuple] = None) -> AsyncIterator[str]:
+    """Validate and store the records of a spooled NDJSON body, yielding results per chunk.
+
+    `rate_limit` is the client's (limiter, key) from RateLimitMiddleware:
+    every record costs a token, and the first record over the limit ends
+    the batch with a rate-limited result.
+    """
+    chunk_size = settings.ingest_batch_size
+    with body:
+        async with AsyncSessionLocal() as db:
+            results, pending = [], []
+
+            async def flush():
+                if pending:
+                    ids = await allocate_submission_ids(db, len(pending))
+                    await db.commit()
+                    for (_, item), submission_id in zip(pending, ids):
+                        item.submission_id = submission_id
+                    try:
+                        errors = {
+                            submission_id: "Could not be stored"
+                            for submission_id in await write_batch([item for _, item in pending])
+                        }
+                    except RetryableWriteError as e:
+                        # Nothing was acknowledged yet, so the client can resend these
+                        errors = {item.submission_id: "Database unavailable, retry later" for item in e.pending}
+                    for result, item in pending:
+                        if item.submission_id in errors:
+                            result.update(status="error", error=errors[item.submission_id])
+                        else:
+                            result.update(status="ok", submission_id=item.submission_id)
+                lines = "".join(json.dumps(result, ensure_ascii=False) + "\n" for result in results)
+                results.clear()
+                pending.clear()
+                return lines
+
+            for number, raw in _ndjson_lines(body):
+                if rate_limit is not None:
+                    limiter, key = rate_limit
+                    wait = await limiter.acquire(key)
+                    if wait:
+                        results.append({
+                            "line": number,
+                            "status": "error",
+                            "error": "Too many requests, this and later records were not processed",
+                            "retry_after": max(1, math.ceil(wait))
+                        })
+                        break
+                if raw is None:
+                    results.append({"line": number, "status": "error", "error": "Line too long"})
+                    continue
+                try:
+                    link, answers = await _validate_batch_record(db, raw)
+                except ValueError as e:
+                    results.append({"line": number, "status": "error", "error": str(e)})
+                    continue
+
+                item = PendingSubmission(
+                    submission_id=0,
+                    survey_link_id=link.link_id,
+                    group_id=link.group_id,
+                    survey_id=link.survey_id,
+                    submitted_at=datetime.now(timezone.utc),
+                    answers=answers
+                )
+                result = {"line": number}
+                results.append(result)
+                pending.append((result, item))
+
+                if len(pending) >= chunk_size:
+                    yield await flush()
+
+            yield await flush()
+
+@router.post("/submit-batch")
+async def submit_survey_batch(request: Request):
+    """Submit many surveys as NDJSON (one SurveySubmissionCreate or SurveyGroupSelection per line).
+
+    The body is read completely first (spooled to disk when large), then
+    records are stored in chunked transactions while the response streams
+    one NDJSON result per record. Each record costs one token of the
+    client's rate limit bucket.
+    """
+    body = await _spool_body(request)
+    rate_limit = getattr(request.state, "rate_limit", None)
+    return StreamingResponse(_process_batch(body, rate_limit), media_type="application/x-ndjson")
+
 @router.post("/links")
 async def create_survey_link(
     link_data: SurveyLinkCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create new survey link (admin/curator only)"""
     # Check group exists
-    group = db.query(Group).filter(Group.id == link_data.group_id).first()
+    group = await db.get(Group, link_data.group_id)
     if not group:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -151,25 +350,152 @@ async def create_survey_link(
     )
 
     db.add(survey_link)
-    db.commit()
-    db.refresh(survey_link)
+    await db.commit()
+    # Forget a cached "unknown token" answer for it
+    invalidate_link(unique_token)
+    await db.refresh(survey_link)
 
     return {
         "id": survey_link.id,
         "unique_token": survey_link.unique_token,
-        "link_url": f"http://localhost:3000/survey/{survey_link.unique_token}",
+        "link_url": survey_link_url(survey_link.unique_token),
         "group_id": survey_link.group_id,
         "created_at": survey_link.created_at,
         "expires_at": survey_link.expires_at,
         "is_active": survey_link.is_active
     }
 
+BULK_LINK_FIELDS = ["id", "group_id", "group_name", "unique_token", "link_url", "created_at", "expires_at", "is_active"]
+
+def _bulk_link_records(rows, group_names: dict) -> Iterator[dict]:
+    for row in sorted(rows, key=lambda row: group_names[row.group_id]):
+        yield {
+            "id": row.id,
+            "group_id": row.group_id,
+            "group_name": group_names[row.group_id],
+            "unique_token": row.unique_token,
+            "link_url": survey_link_url(row.unique_token),
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "expires_at": row.expires_at.isoformat() if row.expires_at else None,
+            "is_active": row.is_active
+        }
+
+def _bulk_links_csv(records: Iterator[dict]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=BULK_LINK_FIELDS)
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _bulk_links_json(records: Iterator[dict]) -> Iterator[str]:
+    yield '{"links": ['
+    for i, record in enumerate(records):
+        yield ("," if i else "") + json.dumps(record, ensure_ascii=False)
+    yield "]}"
+
+@router.post("/links/bulk")
+async def create_survey_links_bulk(
+    link_data: SurveyLinkBulkCreate,
+    format: str = Query("json", pattern="^(json|csv)$"),
+    principal: Principal = Depends(get_link_manager),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create one link for each listed group, or for every group of a faculty/year (admin/curator only).
+
+    Curators only get links for groups they curate. All links are inserted
+    in one transaction; the response streams them as JSON or CSV, ordered
+    by group name.
+    """
+    if link_data.group_ids is None and link_data.faculty_id is None and link_data.year is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Specify group_ids, faculty_id or year"
+        )
+
+    query = select(Group.id, Group.name)
+    if link_data.group_ids is not None:
+        query = query.where(Group.id.in_(link_data.group_ids))
+    if link_data.faculty_id is not None:
+        query = query.where(Group.faculty_id == link_data.faculty_id)
+    if link_data.year is not None:
+        query = query.where(Group.year == link_data.year)
+    if not principal.is_admin:
+        if link_data.group_ids is not None and not set(link_data.group_ids) <= principal.curator_group_ids:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not a curator of all listed groups"
+            )
+        query = query.where(Group.id.in_(principal.curator_group_ids))
+    result = await db.execute(query)
+    group_names = {group_id: name for group_id, name in result}
+
+    if link_data.group_ids is not None and link_data.faculty_id is None and link_data.year is None:
+        missing = sorted(set(link_data.group_ids) - set(group_names))
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Groups not found: {', '.join(map(str, missing))}"
+            )
+    if not group_names:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No groups match"
+        )
+
+    rows = await create_group_links(db, sorted(group_names), link_data.expires_at)
+
+    records = _bulk_link_records(rows, group_names)
+    if format == "csv":
+        return StreamingResponse(
+            _bulk_links_csv(records),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="survey_links.csv"'}
+        )
+    return StreamingResponse(_bulk_links_json(records), media_type="application/json")
+
+@router.patch("/links/{link_id}")
+async def update_link(
+    link_id: int,
+    link_data: SurveyLinkUpdate,
+    principal: Principal = Depends(get_link_manager),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Activate/deactivate a survey link or change its expiry (admin/curator only)"""
+    survey_link = await db.get(SurveyLink, link_id)
+    if not survey_link:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Survey link not found"
+        )
+    if not principal.can_manage_group(survey_link.group_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not a curator of this group"
+        )
+
+    survey_link = await update_survey_link(db, link_id, link_data)
+
+    return {
+        "id": survey_link.id,
+        "unique_token": survey_link.unique_token,
+        "group_id": survey_link.group_id,
+        "expires_at": survey_link.expires_at,
+        "is_active": survey_link.is_active
+    }
+
 @router.get("/groups")
 async def get_survey_groups(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all groups for public survey selection"""
-    groups = db.query(Group).join(Faculty).all()
+    result = await db.execute(
+        select(Group).join(Group.faculty).options(contains_eager(Group.faculty))
+    )
+    groups = result.scalars().all()
 
     result = []
     for group in groups:
@@ -186,21 +512,24 @@ async def get_survey_groups(
 async def get_survey_links(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all survey links with submission counts"""
-    links = db.query(SurveyLink).offset(skip).limit(limit).all()
+    result = await db.execute(
+        select(SurveyLink).options(joinedload(SurveyLink.group)).offset(skip).limit(limit)
+    )
+    links = result.scalars().all()
 
     result = []
     for link in links:
-        submission_count = db.query(SurveySubmission).filter(
-            SurveySubmission.survey_link_id == link.id
-        ).count()
+        submission_count = await db.scalar(
+            select(func.count(SurveySubmission.id)).where(SurveySubmission.survey_link_id == link.id)
+        )
 
         result.append({
             "id": link.id,
             "unique_token": link.unique_token,
-            "link_url": f"http://localhost:3000/survey/{link.unique_token}",
+            "link_url": survey_link_url(link.unique_token),
             "group_id": link.group_id,
             "group_name": link.group.name if link.group else None,
             "created_at": link.created_at,
@@ -4,6 +4,8 @@ from .survey import (
     Survey, SurveySubmission, SurveyAnswer
 )
 from .user import Curator, Admin
+from .statistics import GroupQuestionStats, GroupQuestionRollup, GroupQuestionHistogram
+from .imports import ImportBatch
 
 __all__ = [
     # Faculty
@@ -13,4 +15,8 @@ __all__ = [
     "Survey", "SurveySubmission", "SurveyAnswer",
     # User
     "Curator", "Admin",
+    # Statistics
+    "GroupQuestionStats", "GroupQuestionRollup", "GroupQuestionHistogram",
+    # Imports
+    "ImportBatch",
 ]
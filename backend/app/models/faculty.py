@@ -11,6 +11,7 @@ class Faculty(Base):
     name = Column(String, unique=True, index=True)
     description = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     groups = relationship("Group", back_populates="faculty")
 
@@ -23,6 +24,7 @@ class Group(Base):
     faculty_id = Column(Integer, ForeignKey("faculties.id"))
     year = Column(Integer)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     faculty = relationship("Faculty", back_populates="groups")
     surveys = relationship("Survey", back_populates="group")
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from core.database import Base
+
+
+class ImportBatch(Base):
+    """Ledger of bulk-imported source files, so re-running an import is a no-op"""
+    __tablename__ = "import_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_sha256 = Column(String(64), unique=True, nullable=False)
+    source_name = Column(String, nullable=False)
+    rows = Column(Integer, nullable=False)
+    submissions = Column(Integer, nullable=False)
+    answers = Column(Integer, nullable=False)
+    imported_at = Column(DateTime(timezone=True), server_default=func.now())
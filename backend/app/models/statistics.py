@@ -0,0 +1,54 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from core.database import Base
+
+
+class GroupQuestionStats(Base):
+    """Running aggregates of numeric answers per group and question.
+
+    Maintained on every submission, so statistics reads don't scan survey_answers.
+    """
+    __tablename__ = "group_question_stats"
+
+    group_id = Column(Integer, ForeignKey("groups.id"), primary_key=True)
+    question_code = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    sum = Column(Float, nullable=False, default=0)
+    sum_squares = Column(Float, nullable=False, default=0)
+    min = Column(Float, nullable=True)
+    max = Column(Float, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class GroupQuestionRollup(Base):
+    """Per-question aggregates of numeric answers in day/week buckets of submitted_at.
+
+    Both granularities are maintained on every submission; old daily buckets
+    can be compacted away since the weekly bucket already contains them.
+    """
+    __tablename__ = "group_question_rollups"
+
+    group_id = Column(Integer, ForeignKey("groups.id"), primary_key=True)
+    question_code = Column(String, primary_key=True)
+    granularity = Column(String, primary_key=True)  # "day" or "week"
+    bucket_start = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    sum = Column(Float, nullable=False, default=0)
+    sum_squares = Column(Float, nullable=False, default=0)
+    min = Column(Float, nullable=True)
+    max = Column(Float, nullable=True)
+
+
+class GroupQuestionHistogram(Base):
+    """Value-count histogram of numeric answers per group and question.
+
+    Discrete scale values are stored exactly; other values are snapped to a
+    log-spaced sketch bin (see services.distribution_service), so histograms of
+    any set of groups can be merged by summing counts per value.
+    """
+    __tablename__ = "group_question_histograms"
+
+    group_id = Column(Integer, ForeignKey("groups.id"), primary_key=True)
+    question_code = Column(String, primary_key=True)
+    value = Column(Float, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from core.database import Base
@@ -9,14 +9,20 @@ class SurveyLink(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     unique_token = Column(String, unique=True, index=True)
-    group_id = Column(Integer, ForeignKey("groups.id"))
+    group_id = Column(Integer, ForeignKey("groups.id"), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     expires_at = Column(DateTime(timezone=True))
     is_active = Column(Boolean, default=True)
+    # The group's shared link for anonymous submissions by group selection
+    is_public = Column(Boolean, nullable=False, default=False, server_default=text("false"))
 
     group = relationship("Group", back_populates="survey_links")
     submissions = relationship("SurveySubmission", back_populates="survey_link")
 
+    __table_args__ = (
+        Index("uq_survey_links_public_group", "group_id", unique=True, postgresql_where=text("is_public")),
+    )
+
 
 class SurveyTemplate(Base):
     __tablename__ = "survey_templates"
@@ -75,7 +81,7 @@ class SurveySubmission(Base):
     __tablename__ = "survey_submissions"
 
     id = Column(Integer, primary_key=True, index=True)
-    survey_link_id = Column(Integer, ForeignKey("survey_links.id"))
+    survey_link_id = Column(Integer, ForeignKey("survey_links.id"), index=True)
     submitted_at = Column(DateTime(timezone=True), server_default=func.now())
 
     survey_link = relationship("SurveyLink", back_populates="submissions")
@@ -86,7 +92,7 @@ class SurveyAnswer(Base):
     __tablename__ = "survey_answers"
 
     id = Column(Integer, primary_key=True, index=True)
-    submission_id = Column(Integer, ForeignKey("survey_submissions.id"))
+    submission_id = Column(Integer, ForeignKey("survey_submissions.id"), index=True)
     survey_id = Column(Integer, ForeignKey("surveys.id"))
     # Older schema used question_code/text instead of question_id foreign key.
     # Keep fields compatible with existing DB data which may have question_code/question_text.
@@ -3,9 +3,9 @@ from .survey import (
     SurveyQuestionBase, SurveyQuestionCreate, SurveyQuestionUpdate, SurveyQuestion,
     SurveyTemplateBase, SurveyTemplateCreate, SurveyTemplateUpdate, SurveyTemplateDetail,
     QuestionCategory,
-    SurveyAnswerCreate, SurveySubmissionCreate, SurveyGroupSelection,
+    MAX_NUMERIC_ANSWER, SurveyAnswerCreate, SurveySubmissionCreate, SurveyGroupSelection,
     SurveySubmissionResponse, SurveyAnswerResponse,
-    SurveyLinkCreate, SurveyLinkResponse
+    SurveyLinkCreate, SurveyLinkBulkCreate, SurveyLinkUpdate, SurveyLinkResponse
 )
 
 from .faculty import (
@@ -14,7 +14,8 @@ from .faculty import (
 )
 
 from .statistics import (
-    QuestionStatistics, GroupStatistics, FacultyStatistics, OpenAnswerResponse
+    QuestionStatistics, GroupStatistics, FacultyStatistics, OpenAnswerResponse,
+    TrendGranularity, TrendPoint, ComparisonBaseline
 )
 
 __all__ = [
@@ -23,12 +24,13 @@ __all__ = [
     "SurveyQuestionBase", "SurveyQuestionCreate", "SurveyQuestionUpdate", "SurveyQuestion",
     "SurveyTemplateBase", "SurveyTemplateCreate", "SurveyTemplateUpdate", "SurveyTemplateDetail",
     "QuestionCategory",
-    "SurveyAnswerCreate", "SurveySubmissionCreate", "SurveyGroupSelection",
+    "MAX_NUMERIC_ANSWER", "SurveyAnswerCreate", "SurveySubmissionCreate", "SurveyGroupSelection",
     "SurveySubmissionResponse", "SurveyAnswerResponse",
-    "SurveyLinkCreate", "SurveyLinkResponse",
+    "SurveyLinkCreate", "SurveyLinkBulkCreate", "SurveyLinkUpdate", "SurveyLinkResponse",
     # Faculty
     "FacultyCreate", "FacultyUpdate", "FacultyResponse",
     "GroupCreate", "GroupUpdate", "GroupResponse",
     # Statistics
     "QuestionStatistics", "GroupStatistics", "FacultyStatistics", "OpenAnswerResponse",
+    "TrendGranularity", "TrendPoint", "ComparisonBaseline",
 ]
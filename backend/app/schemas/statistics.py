@@ -1,6 +1,7 @@
 from pydantic import BaseModel
-from typing import List
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, date
+from enum import Enum
 
 
 class QuestionStatistics(BaseModel):
@@ -10,6 +11,10 @@ class QuestionStatistics(BaseModel):
     count: int
     min: float
     max: float
+    stddev: Optional[float] = None
+    median: Optional[float] = None
+    q1: Optional[float] = None
+    q3: Optional[float] = None
 
 
 class GroupStatistics(BaseModel):
@@ -31,3 +36,22 @@ class OpenAnswerResponse(BaseModel):
     question_text: str
     text_value: str
     submitted_at: datetime
+
+
+class TrendGranularity(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+
+
+class ComparisonBaseline(str, Enum):
+    FACULTY = "faculty"
+    UNIVERSITY = "university"
+
+
+class TrendPoint(BaseModel):
+    bucket_start: date
+    average: float
+    count: int
+    min: float
+    max: float
+    stddev: Optional[float] = None
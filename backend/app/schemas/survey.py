@@ -78,10 +78,16 @@ class QuestionCategory(str, Enum):
     OPEN_ANSWER = "open_answer"
 
 
+# Bound on numeric answers: NaN/inf or huge values would poison the running sums for good
+MAX_NUMERIC_ANSWER = 1e9
+
+
 class SurveyAnswerCreate(BaseModel):
     question_code: str
     question_text: str
-    numeric_value: Optional[float] = None
+    numeric_value: Optional[float] = Field(
+        None, ge=-MAX_NUMERIC_ANSWER, le=MAX_NUMERIC_ANSWER, allow_inf_nan=False
+    )
     text_value: Optional[str] = None
 
 
@@ -119,6 +125,20 @@ class SurveyLinkCreate(BaseModel):
     expires_at: Optional[datetime] = None
 
 
+class SurveyLinkBulkCreate(BaseModel):
+    """Groups to create links for: an explicit list, or every group of a faculty and/or year"""
+    group_ids: Optional[List[int]] = None
+    faculty_id: Optional[int] = None
+    year: Optional[int] = None
+    expires_at: Optional[datetime] = None
+
+
+class SurveyLinkUpdate(BaseModel):
+    is_active: Optional[bool] = None
+    # Explicit null removes the expiry
+    expires_at: Optional[datetime] = None
+
+
 class SurveyLinkResponse(BaseModel):
     id: int
     unique_token: str
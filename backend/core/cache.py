@@ -0,0 +1,197 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import pickle
+import threading
+import time
+
+# Returned by TTLCache.get when the key is absent, so that None can be cached
+MISSING = object()
+
+
+class TTLCache:
+    """Bounded in-process LRU mapping whose entries expire after a per-entry TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return the cached value and mark it as recently used"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store value for `ttl` seconds (the cache default when omitted)"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Counters for the metrics endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class MemoryCacheBackend:
+    """Async cache backend for one process: a TTLCache plus version counters.
+
+    Version counters are kept outside the LRU so eviction can never reset a
+    version back to a value that older cache entries were stored under.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = TTLCache(maxsize, ttl)
+        self._versions: dict = {}
+
+    async def get(self, key: Hashable) -> Any:
+        return self.cache.get(key)
+
+    async def set(self, key: Hashable, value: Any):
+        self.cache.set(key, value)
+
+    async def versions(self, *names: str) -> tuple:
+        return tuple(self._versions.get(name, 0) for name in names)
+
+    async def bump(self, *names: str):
+        for name in names:
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self.cache.stats()}
+
+
+class RedisCacheBackend:
+    """Async cache backend shared by all workers through a Redis-compatible server.
+
+    Values are pickled and stored with the cache TTL; memory is bounded by
+    the server (use an `allkeys-lru` maxmemory policy). Versions are INCR
+    counters. Errors talking to the server are treated as misses, so the
+    cache can only ever cost a recomputation.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str):
+        import redis.asyncio
+
+        self.client = redis.asyncio.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key: Hashable) -> str:
+        if isinstance(key, tuple):
+            key = ":".join(str(part) for part in key)
+        return f"{self.prefix}:{key}"
+
+    async def get(self, key: Hashable) -> Any:
+        try:
+            data = await self.client.get(self._key(key))
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache backend error: {e}")
+            data = None
+        if data is None:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return pickle.loads(data)
+
+    async def set(self, key: Hashable, value: Any):
+        try:
+            await self.client.set(self._key(key), pickle.dumps(value), ex=max(int(self.ttl), 1))
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache backend error: {e}")
+
+    async def versions(self, *names: str) -> Optional[tuple]:
+        try:
+            values = await self.client.mget([self._key(("version", name)) for name in names])
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache backend error: {e}")
+            # Unknown version: callers bypass the cache
+            return None
+        return tuple(int(value or 0) for value in values)
+
+    async def bump(self, *names: str):
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for name in names:
+                    pipe.incr(self._key(("version", name)))
+                await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache backend error: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def create_cache_backend(backend: str, maxsize: int, ttl: float, redis_url: Optional[str] = None,
+                         prefix: str = "edupulse"):
+    """Cache backend by name ("memory" or "redis"), falling back to memory if redis is unusable"""
+    if backend == "redis":
+        if not redis_url:
+            print("Cache backend 'redis' needs REDIS_URL, using in-process cache")
+        else:
+            try:
+                return RedisCacheBackend(redis_url, ttl, prefix)
+            except ImportError:
+                print("Cache backend 'redis' needs the redis package, using in-process cache")
+    return MemoryCacheBackend(maxsize, ttl)
@@ -5,6 +5,26 @@ import os
 class Settings(BaseSettings):
     # Database
     database_url: str = os.getenv("DATABASE_URL")
+    # "off", "on" (log statements) or "debug" (statements and result rows)
+    db_echo: str = os.getenv("DB_ECHO", "off")
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", 10))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    # Seconds to wait for a free connection before failing the request
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", 10))
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Recycle connections older than this many seconds (-1 disables)
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    # Server-side statement timeout in milliseconds (0 disables)
+    db_statement_timeout_ms: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+    # Per-request statement counting (X-DB-Queries / X-DB-Time headers)
+    db_query_counter: bool = os.getenv("DB_QUERY_COUNTER", "false").lower() == "true"
+    # In debug mode, warn when one statement shape repeats more than this per request
+    db_n_plus_one_threshold: int = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", 5))
+
+    debug: bool = os.getenv("DEBUG", "false").lower() == "true"
+
+    # Daily trend buckets older than this are folded into weekly ones by `manage.py compact-rollups`
+    rollup_daily_retention_days: int = int(os.getenv("ROLLUP_DAILY_RETENTION_DAYS", 180))
 
     # Keycloak
     keycloak_url: str = os.getenv("KEYCLOAK_URL", "http://keycloak:8080")
@@ -12,6 +32,75 @@ class Settings(BaseSettings):
     keycloak_client_id: str = "psycho-client"
     keycloak_client_secret: Optional[str] = None
     keycloak_external_url: str = os.getenv("KEYCLOAK_EXTERNAL_URL", "http://localhost:3000/auth")
+    # "userinfo" asks Keycloak about every token, "jwks" validates signatures locally
+    keycloak_verify_mode: str = os.getenv("KEYCLOAK_VERIFY_MODE", "jwks")
+    # Expected `iss` claim; defaults to the external realm URL the browser logs in through
+    keycloak_issuer: Optional[str] = os.getenv("KEYCLOAK_ISSUER")
+    # Expected `aud` claim; defaults to the client id (tokens whose `azp` is the client are accepted too)
+    keycloak_audience: Optional[str] = os.getenv("KEYCLOAK_AUDIENCE")
+    # Minimum interval between JWKS refetches triggered by an unknown `kid`
+    keycloak_jwks_min_refresh_seconds: int = int(os.getenv("KEYCLOAK_JWKS_MIN_REFRESH_SECONDS", 30))
+    keycloak_jwt_leeway_seconds: int = int(os.getenv("KEYCLOAK_JWT_LEEWAY_SECONDS", 10))
+    # Discovery/JWKS documents are refreshed in the background after their TTL and
+    # served stale while Keycloak is unreachable, up to the max staleness
+    keycloak_jwks_ttl_seconds: int = int(os.getenv("KEYCLOAK_JWKS_TTL_SECONDS", 300))
+    keycloak_discovery_ttl_seconds: int = int(os.getenv("KEYCLOAK_DISCOVERY_TTL_SECONDS", 3600))
+    keycloak_max_staleness_seconds: int = int(os.getenv("KEYCLOAK_MAX_STALENESS_SECONDS", 86400))
+    # Circuit breaker around outbound Keycloak calls
+    keycloak_breaker_failure_threshold: int = int(os.getenv("KEYCLOAK_BREAKER_FAILURE_THRESHOLD", 5))
+    keycloak_breaker_reset_seconds: int = int(os.getenv("KEYCLOAK_BREAKER_RESET_SECONDS", 30))
+
+    # Outbound HTTP client (Keycloak)
+    http_timeout_seconds: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", 5))
+    http_connect_timeout_seconds: float = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", 2))
+    http_max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", 50))
+    http_max_keepalive_connections: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+    http_max_concurrency: int = int(os.getenv("HTTP_MAX_CONCURRENCY", 20))
+
+    # Verified-token cache (entries also expire with the token's own `exp`)
+    token_cache_size: int = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+    token_cache_ttl_seconds: int = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", 60))
+    token_cache_negative_ttl_seconds: int = int(os.getenv("TOKEN_CACHE_NEGATIVE_TTL_SECONDS", 5))
+
+    # Statistics cache: "memory" (per worker) or "redis" (shared, needs REDIS_URL and the redis package)
+    stats_cache_backend: str = os.getenv("STATS_CACHE_BACKEND", "memory")
+    stats_cache_size: int = int(os.getenv("STATS_CACHE_SIZE", 1000))
+    # Upper bound on staleness when another worker's in-process cache missed an invalidation
+    stats_cache_ttl_seconds: int = int(os.getenv("STATS_CACHE_TTL_SECONDS", 300))
+    redis_url: Optional[str] = os.getenv("REDIS_URL")
+
+    # Survey link token resolver used by the submit path
+    link_cache_size: int = int(os.getenv("LINK_CACHE_SIZE", 10000))
+    # Also how long other workers may accept a link deactivated elsewhere
+    link_cache_ttl_seconds: int = int(os.getenv("LINK_CACHE_TTL_SECONDS", 60))
+    link_cache_negative_ttl_seconds: int = int(os.getenv("LINK_CACHE_NEGATIVE_TTL_SECONDS", 5))
+
+    # Survey submissions: "direct" (one transaction each) or "queued" (write-behind batches)
+    ingest_mode: str = os.getenv("INGEST_MODE", "direct")
+    ingest_queue_size: int = int(os.getenv("INGEST_QUEUE_SIZE", 10000))
+    ingest_batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", 500))
+    # A partial batch is written after waiting this long for more submissions
+    ingest_flush_interval_ms: int = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", 200))
+    # How long a request waits for room in a full queue before getting 503
+    ingest_enqueue_timeout_seconds: float = float(os.getenv("INGEST_ENQUEUE_TIMEOUT_SECONDS", 2))
+    # How long shutdown keeps retrying queued submissions while the database is unavailable
+    ingest_shutdown_retry_seconds: float = float(os.getenv("INGEST_SHUTDOWN_RETRY_SECONDS", 30))
+
+    # Admission control for the public survey endpoints (token buckets)
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    # "memory" (per worker) or "redis" (shared, needs REDIS_URL and the redis package)
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    # A lecture hall usually shares one address, so the per-IP budget is generous
+    rate_limit_ip_per_minute: int = int(os.getenv("RATE_LIMIT_IP_PER_MINUTE", 600))
+    rate_limit_ip_burst: int = int(os.getenv("RATE_LIMIT_IP_BURST", 200))
+    rate_limit_token_per_minute: int = int(os.getenv("RATE_LIMIT_TOKEN_PER_MINUTE", 300))
+    rate_limit_token_burst: int = int(os.getenv("RATE_LIMIT_TOKEN_BURST", 100))
+    rate_limit_max_keys: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+    # Take the client address from X-Forwarded-For (only behind a trusted proxy)
+    rate_limit_trust_forwarded: bool = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+
+    # Base URL of the frontend, for survey links handed out by the API
+    frontend_url: str = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
     # JWT
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
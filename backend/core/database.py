@@ -1,20 +1,142 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+import time
 from core.config import settings
 
+ECHO_LEVELS = {"off": False, "on": True, "debug": "debug"}
+
+class PoolStats:
+    """Counters collected while handing out pooled connections"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connect_errors = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_time_total += seconds
+        self.wait_time_max = max(self.wait_time_max, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "connect_errors": self.connect_errors,
+            "wait_ms_avg": round(self.wait_time_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_ms_max": round(self.wait_time_max * 1000, 3),
+        }
+
+class _InstrumentedPoolMixin:
+    """Times every checkout, including waits for a free slot and new connections"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        stats = self.stats
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            raise
+        except Exception:
+            stats.connect_errors += 1
+            raise
+        finally:
+            stats.record_wait(time.perf_counter() - started)
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _async_database_url(url: str):
+    """Same database, asyncpg driver (DATABASE_URL usually names psycopg2 or no driver)"""
+    async_url = make_url(url)
+    if async_url.get_backend_name() == "postgresql":
+        async_url = async_url.set(drivername="postgresql+asyncpg")
+    return async_url
+
+def _pool_options() -> dict:
+    return {
+        "echo": ECHO_LEVELS.get(settings.db_echo.lower(), False),
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+def _connect_args(is_async: bool) -> dict:
+    if not settings.db_statement_timeout_ms:
+        return {}
+    if is_async:
+        return {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}}
+    return {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+
+# Sync engine: table creation, migrations and maintenance commands
 engine = create_engine(
     settings.database_url,
-    echo=True
+    poolclass=InstrumentedQueuePool,
+    connect_args=_connect_args(is_async=False),
+    **_pool_options()
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: request handlers
+async_engine = create_async_engine(
+    _async_database_url(settings.database_url),
+    poolclass=InstrumentedAsyncQueuePool,
+    connect_args=_connect_args(is_async=True),
+    **_pool_options()
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    # Attributes stay readable after commit without an implicit (blocking) reload
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
+def _pool_status(pool) -> dict:
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.db_max_overflow,
+    }
+    status.update(getattr(pool, "stats", PoolStats()).as_dict())
+    return status
+
+def get_pool_stats() -> dict:
+    """Current pool occupancy and checkout counters for both engines"""
+    return {
+        "async": _pool_status(async_engine.sync_engine.pool),
+        "sync": _pool_status(engine.pool),
+    }
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,46 @@
+from typing import Optional
+import asyncio
+import httpx
+
+from core.config import settings
+
+# Shared client for outbound calls (Keycloak), created and closed by the app lifespan
+http_client: Optional[httpx.AsyncClient] = None
+_request_slots: Optional[asyncio.Semaphore] = None
+
+
+async def init_http_client():
+    """Create the pooled keep-alive client"""
+    global http_client, _request_slots
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            settings.http_timeout_seconds,
+            connect=settings.http_connect_timeout_seconds
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections
+        )
+    )
+    _request_slots = asyncio.Semaphore(settings.http_max_concurrency)
+
+
+async def close_http_client():
+    """Close pooled connections on shutdown"""
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """Send a request through the shared client.
+
+    The number of in-flight requests is bounded so a slow upstream can't
+    tie up every coroutine on the worker.
+    """
+    if http_client is None:
+        await init_http_client()
+
+    async with _request_slots:
+        return await http_client.request(method, url, **kwargs)
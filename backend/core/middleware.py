@@ -0,0 +1,138 @@
+from typing import Optional
+import json
+import math
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from core.query_counter import count_queries
+
+
+class QueryCounterMiddleware(BaseHTTPMiddleware):
+    """Report statements and DB time per request in X-DB-Queries / X-DB-Time.
+
+    With `warn_threshold` set, statement shapes repeated more than that many
+    times in one request (the usual N+1 pattern) are logged.
+    """
+
+    def __init__(self, app, warn_threshold: int = 0):
+        super().__init__(app)
+        self.warn_threshold = warn_threshold
+
+    async def dispatch(self, request: Request, call_next):
+        with count_queries() as stats:
+            response = await call_next(request)
+
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers["X-DB-Time"] = f"{stats.duration * 1000:.1f}ms"
+
+        if self.warn_threshold:
+            for shape, times in stats.repeated(self.warn_threshold):
+                print(f"[db] possible N+1 in {request.method} {request.url.path}: {times}x {shape[:200]}")
+
+        return response
+
+
+class RateLimitMiddleware:
+    """Token-bucket admission control for the public survey endpoints.
+
+    Runs before routing, so a rejected request costs no database work.
+    Every request to `paths` takes a token from its client address bucket;
+    requests to `token_paths` also take one from the bucket of the survey
+    token in their JSON body. Rejections are 429 with Retry-After.
+    The client's limiter and bucket key are left in the request state
+    (`rate_limit`) so endpoints taking many records per request can charge
+    per record.
+
+    Plain ASGI rather than BaseHTTPMiddleware: the body read for the token
+    is replayed to the app, and streamed uploads pass through untouched.
+    """
+
+    # /submit bodies are small; larger ones are passed on without a token check
+    MAX_TOKEN_BODY_BYTES = 256 * 1024
+
+    def __init__(self, app, ip_limiter, token_limiter, paths: set, token_paths: set,
+                 trust_forwarded: bool = False):
+        self.app = app
+        self.ip_limiter = ip_limiter
+        self.token_limiter = token_limiter
+        self.paths = paths
+        self.token_paths = token_paths
+        self.trust_forwarded = trust_forwarded
+
+    def _client_address(self, scope) -> str:
+        if self.trust_forwarded:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        key = f"ip:{self._client_address(scope)}"
+        wait = await self.ip_limiter.acquire(key)
+        if wait:
+            await self._reject(send, wait)
+            return
+        scope.setdefault("state", {})["rate_limit"] = (self.ip_limiter, key)
+
+        if scope["path"] in self.token_paths and scope["method"] == "POST":
+            messages, body = await self._read_body(receive)
+            receive = self._replay(messages, receive)
+            token = self._survey_token(body)
+            if token:
+                wait = await self.token_limiter.acquire(f"token:{token}")
+                if wait:
+                    await self._reject(send, wait)
+                    return
+
+        await self.app(scope, receive, send)
+
+    async def _read_body(self, receive) -> tuple:
+        messages, size = [], 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                return messages, None
+            size += len(message.get("body", b""))
+            if size > self.MAX_TOKEN_BODY_BYTES:
+                return messages, None
+            if not message.get("more_body", False):
+                return messages, b"".join(m.get("body", b"") for m in messages)
+
+    @staticmethod
+    def _replay(messages: list, receive):
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+        return replay
+
+    @staticmethod
+    def _survey_token(body: Optional[bytes]) -> Optional[str]:
+        if not body:
+            return None
+        try:
+            token = json.loads(body).get("unique_token")
+        except (ValueError, AttributeError):
+            return None
+        return token if isinstance(token, str) else None
+
+    @staticmethod
+    async def _reject(send, wait: float):
+        body = json.dumps({"detail": "Too many requests, please retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,81 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import re
+import time
+
+from sqlalchemy import event
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryStats:
+    """Statements executed (and time spent in the database) within one scope"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> list:
+        """Statement shapes executed more than `threshold` times, most frequent first"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """SQL with bound parameters and IN-lists collapsed, so per-row queries compare equal"""
+    shape = _PLACEHOLDER.sub("?", statement)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    stats.record(statement, time.perf_counter() - started.pop())
+
+
+def install_query_counter(*engines):
+    """Listen for statements on the given (sync) engines"""
+    for engine in engines:
+        if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def count_queries():
+    """Collect QueryStats for statements executed inside the block.
+
+    Used by the request middleware, and handy for query budgets in tests:
+
+        with count_queries() as stats:
+            ...
+        assert stats.count <= 3
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
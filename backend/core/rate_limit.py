@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from typing import Optional
+import threading
+import time
+
+
+class TokenBucketLimiter:
+    """In-process token buckets per key: `rate` tokens per second up to `burst`.
+
+    Memory is bounded: keys idle long enough to have refilled completely
+    are dropped (they are indistinguishable from new keys), and beyond
+    `maxsize` keys the least recently used one is evicted.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, maxsize: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._refill_seconds = burst / rate
+
+        self.allowed = 0
+        self.limited = 0
+        self.evictions = 0
+
+    async def acquire(self, key: str, cost: float = 1) -> float:
+        """Take `cost` tokens; returns 0 when allowed, else seconds until it would be"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+
+            entry = self._buckets.get(key)
+            if entry is None:
+                tokens = self.burst
+            else:
+                tokens, updated = entry
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                self._buckets.move_to_end(key)
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+                    self.evictions += 1
+                self.allowed += 1
+                return 0.0
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            self.limited += 1
+            return (cost - tokens) / self.rate
+
+    def _evict_idle(self, now: float):
+        # The LRU end holds the longest idle keys; stop at the first still refilling
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < self._refill_seconds:
+                break
+            del self._buckets[key]
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "keys": len(self._buckets),
+            "maxsize": self.maxsize,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "evictions": self.evictions,
+        }
+
+
+# Same algorithm as TokenBucketLimiter, evaluated atomically on the server
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisTokenBucketLimiter:
+    """Token buckets shared by all workers through a Redis-compatible server.
+
+    Keys expire once they would have refilled. If the server is unreachable
+    requests are let through: the limiter protects the database, it must
+    not become another way to take the survey down.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, url: str, prefix: str):
+        import redis.asyncio
+
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.prefix = prefix
+        self.client = redis.asyncio.from_url(url)
+        self.script = self.client.register_script(_TOKEN_BUCKET_SCRIPT)
+
+        self.allowed = 0
+        self.limited = 0
+        self.errors = 0
+
+    async def acquire(self, key: str, cost: float = 1) -> float:
+        try:
+            wait = float(await self.script(
+                keys=[f"{self.prefix}:{self.name}:{key}"],
+                args=[self.rate, self.burst, time.time(), cost]
+            ))
+        except Exception as e:
+            self.errors += 1
+            print(f"Rate limit backend error: {e}")
+            return 0.0
+        if wait > 0:
+            self.limited += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis",
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "errors": self.errors,
+        }
+
+
+_limiters: dict = {}
+
+
+def create_limiter(name: str, per_minute: float, burst: int, backend: str = "memory",
+                   maxsize: int = 100000, redis_url: Optional[str] = None):
+    """Limiter by backend name ("memory" or "redis"), falling back to memory if redis is unusable"""
+    limiter = None
+    if backend == "redis":
+        if not redis_url:
+            print("Rate limit backend 'redis' needs REDIS_URL, using in-process limiter")
+        else:
+            try:
+                limiter = RedisTokenBucketLimiter(name, per_minute / 60, burst, redis_url, "edupulse:ratelimit")
+            except ImportError:
+                print("Rate limit backend 'redis' needs the redis package, using in-process limiter")
+    if limiter is None:
+        limiter = TokenBucketLimiter(name, per_minute / 60, burst, maxsize)
+    _limiters[name] = limiter
+    return limiter
+
+
+def get_rate_limit_metrics() -> dict:
+    """Limiter counters for the admin metrics endpoint"""
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -0,0 +1,181 @@
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is known to be failing"""
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures,
+    open -> half-open after `reset_timeout` seconds, half-open lets a single
+    trial call through and closes again on success.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+        self.opened_total = 0
+        self.half_opened_total = 0
+        self.rejected_total = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go out right now"""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                self.rejected_total += 1
+                return False
+            self.state = self.HALF_OPEN
+            self.half_opened_total += 1
+            self._trial_in_flight = False
+
+        # Half-open: only one trial call at a time
+        if self._trial_in_flight:
+            self.rejected_total += 1
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened_total += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    async def call(self, func: Callable[[], Awaitable[Any]], is_failure: Callable[[Any], bool] = None) -> Any:
+        """Run `func` through the breaker.
+
+        Exceptions count as failures; `is_failure` can additionally classify
+        a returned value (e.g. a 5xx response) as one.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        try:
+            result = await func()
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (client gone, timeout, shutdown): says nothing about the upstream,
+            # but a half-open trial must not stay in flight forever
+            self._trial_in_flight = False
+            raise
+
+        if is_failure is not None and is_failure(result):
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "open": self.state == self.OPEN,
+            "half_open": self.state == self.HALF_OPEN,
+            "consecutive_failures": self.consecutive_failures,
+            "opened_total": self.opened_total,
+            "half_opened_total": self.half_opened_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+class RefreshingValue:
+    """Stale-while-revalidate holder for a remotely fetched document.
+
+    Fresh values (younger than `ttl`) are returned as is. Stale values are
+    returned immediately while a single background refresh runs, until they
+    are older than `max_staleness`; after that callers wait for the refresh.
+    Concurrent refreshes are collapsed into one (single-flight).
+    """
+
+    def __init__(self, name: str, fetch: Callable[[], Awaitable[Any]], ttl: float, max_staleness: float):
+        self.name = name
+        self._fetch = fetch
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+
+        self.value: Any = None
+        self.fetched_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.stale_served = 0
+
+    def age(self) -> float:
+        if self.fetched_at is None:
+            return float("inf")
+        return time.monotonic() - self.fetched_at
+
+    async def get(self) -> Any:
+        age = self.age()
+        if age < self.ttl:
+            return self.value
+
+        if age < self.max_staleness:
+            self.stale_served += 1
+            self._start_refresh()
+            return self.value
+
+        return await self.refresh()
+
+    async def refresh(self) -> Any:
+        """Fetch a new value, joining a refresh that is already running.
+
+        Failures are raised to the caller; the previous value is kept.
+        """
+        task = self._start_refresh()
+        return await asyncio.shield(task)
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._run_refresh())
+            # Background refreshes may fail with nobody awaiting them
+            self._refresh_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return self._refresh_task
+
+    async def _run_refresh(self) -> Any:
+        try:
+            value = await self._fetch()
+        except Exception as e:
+            self.refresh_failures += 1
+            print(f"Refreshing {self.name} failed: {e}")
+            raise
+
+        self.value = value
+        self.fetched_at = time.monotonic()
+        self.refreshes += 1
+        return value
+
+    def stats(self) -> dict:
+        age = self.age()
+        return {
+            "age_seconds": None if age == float("inf") else round(age, 1),
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "stale_served": self.stale_served,
+        }
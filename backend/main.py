@@ -3,25 +3,41 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 from contextlib import asynccontextmanager
 
-from core.database import engine, Base
+from core.database import engine, async_engine, Base
 from core.config import settings
+from core.middleware import QueryCounterMiddleware, RateLimitMiddleware
+from core.rate_limit import create_limiter
+from core.query_counter import install_query_counter
 from app.api import auth, curator, admin, reports, surveys
+from core.http import init_http_client, close_http_client
 from services.auth_service import init_keycloak_auth
+from services.ingestion_service import start_ingestion, stop_ingestion
 
 # Create tables on startup
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
 
+    await init_http_client()
+
     # Initialize Keycloak authentication
-    init_keycloak_auth(
+    await init_keycloak_auth(
         settings.keycloak_url,
         settings.keycloak_realm,
-        settings.keycloak_client_id
+        settings.keycloak_client_id,
+        settings.keycloak_verify_mode
     )
 
+    if settings.ingest_mode == "queued":
+        start_ingestion()
+
     yield
 
+    # Write queued submissions before the connections go away
+    await stop_ingestion()
+    await close_http_client()
+    await async_engine.dispose()
+
 app = FastAPI(
     title="Social-Psychological Monitoring System",
     description="Anonymous survey system for university social-psychological monitoring",
@@ -29,6 +45,25 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Public survey endpoints: reject floods before they reach the connection pool.
+# Added before CORS so that 429 responses still carry the CORS headers.
+if settings.rate_limit_enabled:
+    app.add_middleware(
+        RateLimitMiddleware,
+        ip_limiter=create_limiter(
+            "ip", settings.rate_limit_ip_per_minute, settings.rate_limit_ip_burst,
+            settings.rate_limit_backend, settings.rate_limit_max_keys, settings.redis_url
+        ),
+        token_limiter=create_limiter(
+            "token", settings.rate_limit_token_per_minute, settings.rate_limit_token_burst,
+            settings.rate_limit_backend, settings.rate_limit_max_keys, settings.redis_url
+        ),
+        paths={"/api/surveys/submit", "/api/surveys/submit-group", "/api/surveys/submit-batch",
+               "/api/surveys/groups"},
+        token_paths={"/api/surveys/submit"},
+        trust_forwarded=settings.rate_limit_trust_forwarded
+    )
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -38,6 +73,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request SQL statement counting (opt-in)
+if settings.db_query_counter:
+    install_query_counter(engine, async_engine.sync_engine)
+    app.add_middleware(
+        QueryCounterMiddleware,
+        warn_threshold=settings.db_n_plus_one_threshold if settings.debug else 0
+    )
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(curator.router, prefix="/api/curator", tags=["curator"])
@@ -0,0 +1,133 @@
+"""Maintenance commands.
+
+    python manage.py rebuild-stats               recompute aggregate tables and histograms from raw answers
+    python manage.py rebuild-stats --check       only report aggregates that drifted
+    python manage.py compact-rollups [--keep-days N]
+                                                 fold old daily trend buckets into weekly ones
+    python manage.py fold-public-links [--dry-run]
+                                                 move one-off /submit-group links onto each group's public link
+    python manage.py import-responses FILE --group-column COL [--question COL=CODE ...]
+                                                 bulk-load historical responses (CSV/Parquet) with COPY
+"""
+import argparse
+import asyncio
+from datetime import date, timedelta
+
+from core.config import settings
+from core.database import AsyncSessionLocal
+from services.statistics_service import (
+    rebuild_group_question_stats, check_group_question_stats, rebuild_rollups, compact_daily_rollups
+)
+from services.distribution_service import rebuild_histograms
+from services.survey_service import bump_statistics_version
+from services.link_service import fold_throwaway_links
+from services.import_service import import_responses
+
+
+async def rebuild_stats(args) -> int:
+    async with AsyncSessionLocal() as db:
+        if args.check:
+            drift = await check_group_question_stats(db)
+            for entry in drift:
+                print(f"drift: group={entry['group_id']} question={entry['question_code']} "
+                      f"expected_count={entry['expected_count']} stored_count={entry['stored_count']}")
+            print(f"{len(drift)} drifted group/question aggregates")
+            return 1 if drift else 0
+
+        rows = await rebuild_group_question_stats(db)
+        print(f"group_question_stats rebuilt: {rows} rows")
+        rows = await rebuild_rollups(db)
+        print(f"group_question_rollups rebuilt: {rows} rows")
+        rows = await rebuild_histograms(db)
+        print(f"group_question_histograms rebuilt: {rows} rows")
+        # Only reaches a shared (redis) cache; in-process caches expire by TTL
+        await bump_statistics_version()
+        return 0
+
+
+async def compact_rollups(args) -> int:
+    older_than = date.today() - timedelta(days=args.keep_days)
+    async with AsyncSessionLocal() as db:
+        removed = await compact_daily_rollups(db, older_than)
+    print(f"compacted daily buckets before {older_than}: {removed} rows removed")
+    return 0
+
+
+async def fold_public_links(args) -> int:
+    async with AsyncSessionLocal() as db:
+        summary = await fold_throwaway_links(db, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"{summary['links']} throwaway links in {summary['groups']} groups would be folded")
+    else:
+        print(f"folded {summary['links']} throwaway links in {summary['groups']} groups, "
+              f"{summary.get('submissions_moved', 0)} submissions moved")
+    return 0
+
+
+def _print_import_progress(report):
+    print(f"  {report.rows} rows, {report.submissions} submissions, {report.answers} answers "
+          f"({report.rows_per_second:.0f} rows/s)")
+
+
+async def import_responses_command(args) -> int:
+    questions = None
+    if args.question:
+        questions = {}
+        for mapping in args.question:
+            column, _, code = mapping.partition("=")
+            questions[column] = code or column
+    fmt = args.format or ("parquet" if args.file.endswith(".parquet") else "csv")
+
+    async with AsyncSessionLocal() as db:
+        report = await import_responses(
+            db, args.file, args.group_column, questions, args.submitted_at_column,
+            fmt, args.chunk_size, args.defer_indexes, _print_import_progress
+        )
+    if report is None:
+        print(f"{args.file} was already imported, nothing to do")
+        return 0
+
+    await bump_statistics_version()
+    print(f"imported {report.submissions} submissions ({report.answers} answers) from {report.rows} rows "
+          f"in {report.seconds:.1f}s, {report.rows_per_second:.0f} rows/s")
+    for reason, count in report.skipped.items():
+        print(f"  skipped {count} rows: {reason}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EduPulse maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-stats", help="Recompute statistics aggregates from raw answers")
+    rebuild.add_argument("--check", action="store_true", help="Only report drift, don't rewrite")
+    rebuild.set_defaults(handler=rebuild_stats)
+
+    compact = commands.add_parser("compact-rollups", help="Fold old daily trend buckets into weekly ones")
+    compact.add_argument("--keep-days", type=int, default=settings.rollup_daily_retention_days,
+                         help="Daily buckets to keep (default: ROLLUP_DAILY_RETENTION_DAYS)")
+    compact.set_defaults(handler=compact_rollups)
+
+    fold = commands.add_parser("fold-public-links",
+                               help="Move submissions of one-off group links onto the group's public link")
+    fold.add_argument("--dry-run", action="store_true", help="Only count the links that would be folded")
+    fold.set_defaults(handler=fold_public_links)
+
+    load = commands.add_parser("import-responses", help="Bulk-load historical responses from CSV or Parquet")
+    load.add_argument("file")
+    load.add_argument("--group-column", required=True, help="Column with the group name")
+    load.add_argument("--question", action="append", metavar="COLUMN=CODE",
+                      help="Map a column to a question code (default: every other column, by header)")
+    load.add_argument("--submitted-at-column", help="Column with the ISO submission time (default: now)")
+    load.add_argument("--format", choices=["csv", "parquet"], help="Default: from the file extension")
+    load.add_argument("--chunk-size", type=int, default=5000, help="Rows per COPY (default: 5000)")
+    load.add_argument("--defer-indexes", action="store_true",
+                      help="Drop and rebuild survey_answers indexes around the load (locks the table; offline only)")
+    load.set_defaults(handler=import_responses_command)
+
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(args.handler(args)))
+
+
+if __name__ == "__main__":
+    main()
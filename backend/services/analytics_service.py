@@ -0,0 +1,193 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import numpy as np
+from app.models import Group, Faculty, GroupQuestionStats
+
+# Two-sided 95% normal quantile used for confidence intervals
+CONFIDENCE_Z = 1.96
+
+class GroupMatrix:
+    """Per-question running sums of many groups as (groups x questions) arrays"""
+
+    def __init__(self, groups: list, questions: list, count, total, sum_squares):
+        self.groups = groups
+        self.questions = questions
+        self.count = count
+        self.total = total
+        self.sum_squares = sum_squares
+        self.group_ids = np.array([group["group_id"] for group in groups], dtype=np.int64)
+        self.faculty_ids = np.array([group["faculty_id"] or 0 for group in groups], dtype=np.int64)
+        self.years = np.array([group["year"] or 0 for group in groups], dtype=np.int64)
+
+async def load_group_matrix(db: AsyncSession, *criteria) -> GroupMatrix:
+    """Load group_question_stats of all groups matching `criteria` in one query"""
+    result = await db.execute(
+        select(
+            GroupQuestionStats.group_id,
+            GroupQuestionStats.question_code,
+            GroupQuestionStats.count,
+            GroupQuestionStats.sum,
+            GroupQuestionStats.sum_squares,
+            Group.name,
+            Group.year,
+            Group.faculty_id,
+            Faculty.name.label("faculty_name")
+        )
+        .join(Group, Group.id == GroupQuestionStats.group_id)
+        .outerjoin(Faculty, Faculty.id == Group.faculty_id)
+        .where(*criteria)
+        .order_by(GroupQuestionStats.group_id, GroupQuestionStats.question_code)
+    )
+    rows = result.all()
+
+    groups, group_index, question_index = [], {}, {}
+    for row in rows:
+        if row.group_id not in group_index:
+            group_index[row.group_id] = len(groups)
+            groups.append({
+                "group_id": row.group_id,
+                "group_name": row.name,
+                "year": row.year,
+                "faculty_id": row.faculty_id,
+                "faculty_name": row.faculty_name
+            })
+        question_index.setdefault(row.question_code, None)
+
+    questions = sorted(question_index)
+    question_index = {code: i for i, code in enumerate(questions)}
+
+    shape = (len(groups), len(questions))
+    count, total, sum_squares = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    if rows:
+        g = np.fromiter((group_index[row.group_id] for row in rows), dtype=np.intp, count=len(rows))
+        q = np.fromiter((question_index[row.question_code] for row in rows), dtype=np.intp, count=len(rows))
+        count[g, q] = [row.count for row in rows]
+        total[g, q] = [row.sum for row in rows]
+        sum_squares[g, q] = [row.sum_squares for row in rows]
+
+    return GroupMatrix(groups, questions, count, total, sum_squares)
+
+def moments(count, total, sum_squares) -> dict:
+    """Elementwise mean, sample std, standard error and 95% CI; NaN where undefined"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(count > 0, total / count, np.nan)
+        variance = np.where(count > 1, (sum_squares - total * mean) / (count - 1), np.nan)
+        std = np.sqrt(np.maximum(variance, 0.0))
+        stderr = std / np.sqrt(count)
+    return {
+        "mean": mean,
+        "std": std,
+        "ci_low": mean - CONFIDENCE_Z * stderr,
+        "ci_high": mean + CONFIDENCE_Z * stderr,
+        "stderr": stderr
+    }
+
+def sums_by_key(keys, *arrays) -> tuple:
+    """Row sums of each (rows x questions) array per distinct key, plus the row -> key index"""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    sums = []
+    for array in arrays:
+        summed = np.zeros((len(unique_keys), array.shape[1]))
+        np.add.at(summed, inverse, array)
+        sums.append(summed)
+    return unique_keys, inverse, sums
+
+def z_scores(mean, count, baseline: dict):
+    """How many standard errors each mean lies from its baseline mean"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (mean - baseline["mean"]) / (baseline["std"] / np.sqrt(count))
+    return np.where(np.isfinite(z), z, np.nan)
+
+def rank_columns(values):
+    """1-based rank of each row per column, highest first; 0 where the value is NaN"""
+    order = np.argsort(np.where(np.isnan(values), np.inf, -values), axis=0, kind="stable")
+    ranks = np.empty_like(order)
+    positions = np.broadcast_to(np.arange(1, values.shape[0] + 1)[:, None], values.shape)
+    np.put_along_axis(ranks, order, positions, axis=0)
+    return np.where(np.isnan(values), 0, ranks)
+
+def _cell(array, i: int, j: int):
+    value = array[i, j]
+    return None if np.isnan(value) else float(value)
+
+def _question_entries(questions: list, count, metrics: dict, i: int) -> dict:
+    entries = {}
+    for j, code in enumerate(questions):
+        if not count[i, j]:
+            continue
+        entries[code] = {
+            "count": int(count[i, j]),
+            **{name: _cell(array, i, j) for name, array in metrics.items() if name != "rank"},
+            "rank": int(metrics["rank"][i, j]) or None
+        }
+    return entries
+
+def compare_groups(matrix: GroupMatrix, baseline: str = "faculty", faculty_id=None, year=None) -> list:
+    """Per-group mean/std/CI, z-score against the faculty or university baseline and rank.
+
+    Baselines are always computed over every loaded group; `faculty_id` and
+    `year` only select which groups are reported. Ranks are among the
+    reported groups.
+    """
+    stats = moments(matrix.count, matrix.total, matrix.sum_squares)
+
+    if baseline == "university":
+        university = moments(matrix.count.sum(axis=0), matrix.total.sum(axis=0), matrix.sum_squares.sum(axis=0))
+        reference = {name: np.broadcast_to(array, matrix.count.shape) for name, array in university.items()}
+    else:
+        _, inverse, sums = sums_by_key(matrix.faculty_ids, matrix.count, matrix.total, matrix.sum_squares)
+        reference = {name: array[inverse] for name, array in moments(*sums).items()}
+    reference_mean, reference_std = reference["mean"], reference["std"]
+
+    selected = np.ones(len(matrix.groups), dtype=bool)
+    if faculty_id is not None:
+        selected &= matrix.faculty_ids == faculty_id
+    if year is not None:
+        selected &= matrix.years == year
+
+    rows = np.flatnonzero(selected)
+    count = matrix.count[rows]
+    mean = stats["mean"][rows]
+    metrics = {
+        "mean": mean,
+        "std": stats["std"][rows],
+        "ci_low": stats["ci_low"][rows],
+        "ci_high": stats["ci_high"][rows],
+        "baseline_mean": reference_mean[rows],
+        "z_score": z_scores(mean, count, {"mean": reference_mean[rows], "std": reference_std[rows]}),
+        "rank": rank_columns(mean)
+    }
+
+    return [
+        {**matrix.groups[row], "questions": _question_entries(matrix.questions, count, metrics, i)}
+        for i, row in enumerate(rows)
+    ]
+
+def compare_faculties(matrix: GroupMatrix) -> list:
+    """Per-faculty mean/std/CI, z-score against the university and rank"""
+    faculty_ids, inverse, (count, total, sum_squares) = sums_by_key(
+        matrix.faculty_ids, matrix.count, matrix.total, matrix.sum_squares
+    )
+    stats = moments(count, total, sum_squares)
+    university = moments(count.sum(axis=0), total.sum(axis=0), sum_squares.sum(axis=0))
+    metrics = {
+        "mean": stats["mean"],
+        "std": stats["std"],
+        "ci_low": stats["ci_low"],
+        "ci_high": stats["ci_high"],
+        "baseline_mean": np.broadcast_to(university["mean"], count.shape),
+        "z_score": z_scores(stats["mean"], count, university),
+        "rank": rank_columns(stats["mean"])
+    }
+
+    names = {group["faculty_id"] or 0: group["faculty_name"] for group in matrix.groups}
+    group_counts = np.bincount(inverse, minlength=len(faculty_ids))
+    return [
+        {
+            "faculty_id": int(faculty_id) or None,
+            "faculty_name": names.get(int(faculty_id)),
+            "total_groups": int(group_counts[i]),
+            "questions": _question_entries(matrix.questions, count, metrics, i)
+        }
+        for i, faculty_id in enumerate(faculty_ids)
+    ]
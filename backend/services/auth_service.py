@@ -1,29 +1,259 @@
 from fastapi import HTTPException, status, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from dataclasses import dataclass, field
 from typing import Optional
-import requests
+from jose import jwt, JWTError
+import hashlib
+import httpx
+import time
 import urllib.parse
 
 from core.config import settings
+from core.cache import TTLCache, MISSING
+from core import http
+from core.resilience import CircuitBreaker, CircuitOpenError, RefreshingValue
+from sqlalchemy import select
+from core.database import AsyncSessionLocal
+from app.models import Curator
 
 security = HTTPBearer(auto_error=False)
 
+class KeycloakUnavailableError(Exception):
+    """Keycloak could not be reached or its circuit is open"""
+
+def _normalize_role(name: str) -> set:
+    """Lowercased role/group name plus its singular/plural variant"""
+    if not isinstance(name, str):
+        return set()
+    n = name.lower().strip()
+    if '/' in n:
+        n = n.split('/')[-1]
+    variants = {n}
+    if n.endswith('s'):
+        variants.add(n[:-1])
+    else:
+        variants.add(n + 's')
+    return variants
+
+ADMIN_ROLES = frozenset(_normalize_role("admins"))
+CURATOR_ROLES = frozenset(_normalize_role("curators"))
+
+@dataclass(frozen=True)
+class Principal:
+    """Verified user with roles normalized once per token"""
+    claims: dict = field(compare=False)
+    # Role and group names as Keycloak reports them (shown to the frontend)
+    roles: tuple = ()
+    # Every normalized variant of `roles`, for constant-time checks
+    normalized_roles: frozenset = frozenset()
+    groups: frozenset = frozenset()
+    curator_group_ids: frozenset = frozenset()
+
+    def has_any_role(self, variants: frozenset) -> bool:
+        return not variants.isdisjoint(self.normalized_roles)
+
+    @property
+    def is_admin(self) -> bool:
+        return self.has_any_role(ADMIN_ROLES)
+
+    def can_manage_group(self, group_id: Optional[int]) -> bool:
+        """Admins manage every group, curators only the groups they curate"""
+        return self.is_admin or group_id in self.curator_group_ids
+
+async def _load_curator_group_ids(keycloak_id: str) -> frozenset:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Curator.group_id).where(Curator.keycloak_id == keycloak_id))
+        return frozenset(group_id for group_id in result.scalars() if group_id is not None)
+
 class KeycloakAuth:
-    def __init__(self, keycloak_url: str, realm: str, client_id: str):
+    def __init__(self, keycloak_url: str, realm: str, client_id: str, verify_mode: str = "userinfo"):
         self.keycloak_url = keycloak_url
         self.realm = realm
         self.client_id = client_id
+        self.verify_mode = verify_mode
         # Use the standard OpenID Connect discovery URL (note the hyphen)
         self.well_known_url = f"{keycloak_url}/auth/realms/{realm}/.well-known/openid-configuration"
+        # Signing keys are fetched through the internal URL, the discovery document
+        # advertises the external one which is not reachable from the container
+        self.jwks_url = f"{keycloak_url}/auth/realms/{realm}/protocol/openid-connect/certs"
+        self.issuer = settings.keycloak_issuer or f"{settings.keycloak_external_url}/realms/{realm}"
+        self.audience = settings.keycloak_audience or client_id
+
+        self.breaker = CircuitBreaker(
+            "keycloak",
+            settings.keycloak_breaker_failure_threshold,
+            settings.keycloak_breaker_reset_seconds
+        )
+        # kid -> JWK
+        self.jwks = RefreshingValue(
+            "keycloak jwks", self._fetch_jwks,
+            settings.keycloak_jwks_ttl_seconds, settings.keycloak_max_staleness_seconds
+        )
+        self.discovery = RefreshingValue(
+            "keycloak discovery", self._fetch_discovery,
+            settings.keycloak_discovery_ttl_seconds, settings.keycloak_max_staleness_seconds
+        )
+        self._last_forced_jwks_refresh = 0.0
+
+        # sha256(token) -> Principal, or None for tokens Keycloak rejected
+        self.token_cache = TTLCache(settings.token_cache_size, settings.token_cache_ttl_seconds)
+
+    async def authenticate(self, token: str) -> Optional[Principal]:
+        """Verify token, reusing the result of a previous verification of the same token"""
+        key = hashlib.sha256(token.encode()).hexdigest()
+        cached = self.token_cache.get(key)
+        if cached is not MISSING:
+            return cached
+
+        user_info = await self.verify_token(token)
+        if user_info is None:
+            # Keep rejections briefly so a bad cookie can't hammer Keycloak
+            self.token_cache.set(key, None, settings.token_cache_negative_ttl_seconds)
+            return None
+
+        principal = await self.build_principal(user_info)
+        self.token_cache.set(key, principal, self._cache_ttl(token, user_info))
+        return principal
+
+    async def build_principal(self, user_info: dict) -> Principal:
+        """Normalize roles and groups and resolve curated groups for a verified user"""
+        roles = self.get_user_roles(user_info)
+
+        normalized_roles = set()
+        for r in roles:
+            normalized_roles.update(_normalize_role(r))
+
+        groups = frozenset(
+            g.strip().split('/')[-1].lower()
+            for g in user_info.get("groups") or []
+            if isinstance(g, str) and g.strip().split('/')[-1]
+        )
+
+        curator_group_ids = frozenset()
+        sub = user_info.get("sub")
+        if sub and "curators" in normalized_roles:
+            try:
+                curator_group_ids = await _load_curator_group_ids(sub)
+            except Exception as e:
+                print(f"Failed to load curator groups: {e}")
+
+        return Principal(
+            claims=user_info,
+            roles=tuple(roles),
+            normalized_roles=frozenset(normalized_roles),
+            groups=groups,
+            curator_group_ids=curator_group_ids
+        )
+
+    def _cache_ttl(self, token: str, claims: dict) -> float:
+        """Seconds a verified token may stay cached: min(token exp, configured TTL)"""
+        exp = claims.get("exp")
+        if exp is None:
+            # userinfo responses carry no exp, read it from the (already verified) token
+            try:
+                exp = jwt.get_unverified_claims(token).get("exp")
+            except JWTError:
+                exp = None
+
+        ttl = settings.token_cache_ttl_seconds
+        if isinstance(exp, (int, float)):
+            ttl = min(ttl, exp - time.time())
+        return ttl
+
+    async def verify_token(self, token: str) -> Optional[dict]:
+        """Verify JWT token using the configured verification mode"""
+        if self.verify_mode == "jwks":
+            return await self.verify_token_locally(token)
+        return await self.verify_token_userinfo(token)
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Call Keycloak through the circuit breaker (5xx responses count as failures)"""
+        try:
+            return await self.breaker.call(
+                lambda: http.request(method, url, **kwargs),
+                is_failure=lambda response: response.status_code >= 500
+            )
+        except CircuitOpenError as e:
+            raise KeycloakUnavailableError(str(e))
+        except httpx.HTTPError as e:
+            raise KeycloakUnavailableError(f"{method} {url} failed: {e!r}")
+
+    async def _fetch_jwks(self) -> dict:
+        """Download the realm signing keys"""
+        response = await self._request("GET", self.jwks_url)
+        if response.status_code != 200:
+            raise KeycloakUnavailableError(f"Failed to fetch JWKS: {response.status_code}")
+        return {key["kid"]: key for key in response.json().get("keys", []) if key.get("kid")}
+
+    async def _fetch_discovery(self) -> dict:
+        """Download the OpenID Connect discovery document"""
+        response = await self._request("GET", self.well_known_url)
+        if response.status_code != 200:
+            raise KeycloakUnavailableError(f"Failed to fetch well-known config: {response.status_code}")
+        return response.json()
+
+    async def get_signing_key(self, kid: str) -> Optional[dict]:
+        """Return the cached JWK for `kid`, refetching the key set once if it is unknown.
+
+        Refetches are rate limited so that tokens with made-up key ids can't be
+        used to hammer Keycloak.
+        """
+        keys = await self.jwks.get()
+        key = keys.get(kid)
+        if key is not None:
+            return key
+
+        now = time.monotonic()
+        if now - self._last_forced_jwks_refresh < settings.keycloak_jwks_min_refresh_seconds:
+            return None
+        self._last_forced_jwks_refresh = now
+
+        keys = await self.jwks.refresh()
+        return keys.get(kid)
+
+    async def verify_token_locally(self, token: str) -> Optional[dict]:
+        """Validate signature, exp, iss and aud against the cached realm JWKS"""
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            print(f"Malformed token: {e}")
+            return None
+
+        kid = header.get("kid")
+        key = await self.get_signing_key(kid) if kid else None
+        if key is None:
+            print(f"No signing key for kid {kid!r}")
+            return None
 
-    def verify_token(self, token: str) -> Optional[dict]:
-        """Verify JWT token with Keycloak"""
         try:
-            response = requests.get(self.well_known_url)
-            if response.status_code != 200:
-                print(f"Failed to fetch well-known config: {response.status_code}")
-                return None
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[key.get("alg") or header.get("alg") or "RS256"],
+                issuer=self.issuer,
+                # Keycloak puts "account" into `aud` and the client into `azp`,
+                # so the audience is checked by hand below
+                options={"verify_aud": False, "leeway": settings.keycloak_jwt_leeway_seconds},
+            )
+        except JWTError as e:
+            print(f"Token verification error: {e}")
+            return None
+
+        audience = claims.get("aud")
+        audiences = audience if isinstance(audience, list) else [audience]
+        if self.audience not in audiences and claims.get("azp") != self.client_id:
+            print(f"Token audience mismatch: aud={audience!r} azp={claims.get('azp')!r}")
+            return None
+
+        return claims
+
+    async def verify_token_userinfo(self, token: str) -> Optional[dict]:
+        """Verify JWT token with Keycloak"""
+        # The discovery document is only re-fetched after its TTL, and served
+        # stale while Keycloak is unreachable
+        await self.discovery.get()
 
+        try:
             headers = {"Authorization": f"Bearer {token}"}
             userinfo_url = f"{self.keycloak_url}/auth/realms/{self.realm}/protocol/openid-connect/userinfo"
 
@@ -37,13 +267,15 @@ class KeycloakAuth:
                 headers['X-Forwarded-Host'] = external_netloc
                 headers['X-Forwarded-Proto'] = urllib.parse.urlparse(settings.keycloak_external_url).scheme or 'http'
 
-            user_response = requests.get(userinfo_url, headers=headers)
+            user_response = await self._request("GET", userinfo_url, headers=headers)
             if user_response.status_code == 200:
                 return user_response.json()
 
             print(f"Userinfo request failed: {user_response.status_code} {user_response.text}")
             return None
 
+        except KeycloakUnavailableError:
+            raise
         except Exception as e:
             print(f"Token verification error: {e}")
             return None
@@ -75,15 +307,35 @@ class KeycloakAuth:
 # Global instance
 keycloak_auth = None
 
-def init_keycloak_auth(keycloak_url: str, realm: str, client_id: str):
+async def init_keycloak_auth(keycloak_url: str, realm: str, client_id: str, verify_mode: str = "userinfo"):
     """Initialize Keycloak authentication"""
     global keycloak_auth
-    keycloak_auth = KeycloakAuth(keycloak_url, realm, client_id)
+    keycloak_auth = KeycloakAuth(keycloak_url, realm, client_id, verify_mode)
+    # Warm the document cache so the first request doesn't pay for the download
+    try:
+        if verify_mode == "jwks":
+            await keycloak_auth.jwks.refresh()
+        else:
+            await keycloak_auth.discovery.refresh()
+    except KeycloakUnavailableError as e:
+        print(f"Keycloak not reachable on startup: {e}")
+
+def get_auth_metrics() -> dict:
+    """Token cache counters for the admin metrics endpoint"""
+    if not keycloak_auth:
+        return {}
+    return {
+        "token_cache": keycloak_auth.token_cache.stats(),
+        "keycloak_circuit": keycloak_auth.breaker.stats(),
+        "jwks": keycloak_auth.jwks.stats(),
+        "discovery": keycloak_auth.discovery.stats()
+    }
 
-def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
-    """Get current authenticated user.
+async def get_current_principal(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    """Get current authenticated principal.
 
     Support both Authorization: Bearer <token> and cookie 'access_token'.
+    The principal is also stored on `request.state.principal`.
     """
     if not keycloak_auth:
         raise HTTPException(
@@ -107,46 +359,50 @@ def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials
             detail="Not authenticated"
         )
 
-    user_info = keycloak_auth.verify_token(token)
+    try:
+        principal = await keycloak_auth.authenticate(token)
+    except KeycloakUnavailableError as e:
+        print(f"Token verification skipped: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service unavailable"
+        )
 
-    if not user_info:
+    if not principal:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
         )
 
-    return user_info
+    request.state.principal = principal
+    return principal
+
+def get_current_user(principal: Principal = Depends(get_current_principal)) -> dict:
+    """Get current authenticated user claims."""
+    return principal.claims
 
 def require_role(required_role: str):
     """Decorator to require specific role or group name."""
-    def role_checker(user: dict = Depends(get_current_user)):
-        roles = keycloak_auth.get_user_roles(user)
-
-        def _normalize(name: str) -> set:
-            if not isinstance(name, str):
-                return set()
-            n = name.lower().strip()
-            if '/' in n:
-                n = n.split('/')[-1]
-            variants = {n}
-            if n.endswith('s'):
-                variants.add(n[:-1])
-            else:
-                variants.add(n + 's')
-            return variants
+    accepted = frozenset(_normalize_role(required_role) | {required_role})
 
-        normalized_roles = set()
-        for r in roles or []:
-            normalized_roles.update(_normalize(r))
-
-        if required_role not in normalized_roles and not (_normalize(required_role) & normalized_roles):
+    def role_checker(principal: Principal = Depends(get_current_principal)):
+        if not principal.has_any_role(accepted):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"Required role or group: {required_role}"
             )
-        return user
+        return principal.claims
     return role_checker
 
+def get_link_manager(principal: Principal = Depends(get_current_principal)) -> Principal:
+    """Admin or curator; check `can_manage_group` for the groups touched"""
+    if not principal.has_any_role(ADMIN_ROLES | CURATOR_ROLES):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Required role or group: admins or curators"
+        )
+    return principal
+
 def get_admin_user(user: dict = Depends(require_role("admins"))):
     """Get admin user (accepts Keycloak group 'admins')."""
     return user
@@ -0,0 +1,169 @@
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from collections import Counter
+import math
+from app.models import SurveyAnswer, SurveySubmission, SurveyLink, Group, GroupQuestionHistogram
+from app.schemas import MAX_NUMERIC_ANSWER, SurveyAnswerCreate
+
+# Relative accuracy of percentiles for values that are not on a discrete scale
+SKETCH_RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# Percentiles reported for every question
+PERCENTILES = {"p10": 0.1, "q1": 0.25, "median": 0.5, "q3": 0.75, "p90": 0.9}
+
+def histogram_bin(value: float) -> float:
+    """Histogram key for an answer value.
+
+    Integers (the QuestionOption.value scale) are kept exactly. Anything else
+    is snapped to the representative of its log-spaced bucket, which keeps
+    the histogram small and mergeable with a bounded relative error.
+    """
+    if value.is_integer() or not math.isfinite(value):
+        return float(value)
+    magnitude = abs(value)
+    index = math.ceil(math.log(magnitude) / _LOG_GAMMA)
+    representative = 2 * _GAMMA ** index / (_GAMMA + 1)
+    return math.copysign(round(representative, 9), value)
+
+def percentiles_from_histogram(bins: list) -> dict:
+    """Linearly interpolated percentiles from sorted (value, count) pairs"""
+    total = sum(count for _, count in bins)
+    if not total:
+        return {name: None for name in PERCENTILES}
+
+    def value_at(rank: int) -> float:
+        seen = 0
+        for value, count in bins:
+            seen += count
+            if rank < seen:
+                return value
+        return bins[-1][0]
+
+    result = {}
+    for name, q in PERCENTILES.items():
+        position = q * (total - 1)
+        lower, upper = math.floor(position), math.ceil(position)
+        low_value = value_at(lower)
+        high_value = value_at(upper) if upper != lower else low_value
+        result[name] = low_value + (high_value - low_value) * (position - lower)
+    return result
+
+def distribution_from_histogram(bins: list) -> dict:
+    return {
+        "count": sum(count for _, count in bins),
+        **percentiles_from_histogram(bins),
+        "histogram": [{"value": value, "count": count} for value, count in bins]
+    }
+
+def usable_numeric_value(value) -> bool:
+    """Whether a numeric answer may enter the aggregates (rows stored before validation included)"""
+    return value is not None and math.isfinite(value) and abs(value) <= MAX_NUMERIC_ANSWER
+
+def usable_numeric_answer():
+    """SQL counterpart of usable_numeric_value (NaN sorts above every number in PostgreSQL)"""
+    return SurveyAnswer.numeric_value.between(-MAX_NUMERIC_ANSWER, MAX_NUMERIC_ANSWER)
+
+# Four bound columns per histogram row
+HISTOGRAM_ROWS_PER_STATEMENT = 5000
+
+def count_histogram_bins(counts: Counter, group_id: int, answers: list[SurveyAnswerCreate]):
+    """Add a submission's numeric answers to `counts`, keyed by (group_id, question_code, bin)"""
+    for answer in answers:
+        if usable_numeric_value(answer.numeric_value):
+            counts[(group_id, answer.question_code, histogram_bin(answer.numeric_value))] += 1
+
+async def merge_histogram_counts(db: AsyncSession, counts: Counter):
+    """Add bin counts to the histograms with multi-row upserts (caller commits)"""
+    # Primary key order, see record_submission_stats
+    rows = [
+        {"group_id": group_id, "question_code": question_code, "value": value, "count": count}
+        for (group_id, question_code, value), count in sorted(counts.items())
+    ]
+    table = GroupQuestionHistogram.__table__
+    for start in range(0, len(rows), HISTOGRAM_ROWS_PER_STATEMENT):
+        stmt = insert(GroupQuestionHistogram).values(rows[start:start + HISTOGRAM_ROWS_PER_STATEMENT])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.group_id, table.c.question_code, table.c.value],
+            set_={"count": table.c.count + stmt.excluded.count}
+        ))
+
+async def record_submission_histogram(db: AsyncSession, group_id: int, answers: list[SurveyAnswerCreate]):
+    """Count a submission's numeric answers into the histograms (caller commits)"""
+    counts = Counter()
+    count_histogram_bins(counts, group_id, answers)
+    await merge_histogram_counts(db, counts)
+
+async def _merged_histograms(db: AsyncSession, key_columns: list, criteria: tuple):
+    """Histogram rows summed over all groups matching `criteria`"""
+    histogram = GroupQuestionHistogram
+    result = await db.execute(
+        select(*key_columns, histogram.value, func.sum(histogram.count).label("count"))
+        .join(Group, Group.id == histogram.group_id)
+        .where(*criteria)
+        .group_by(*key_columns, histogram.value)
+        .order_by(*key_columns, histogram.value)
+    )
+    return result
+
+async def get_distribution(db: AsyncSession, *criteria) -> dict:
+    """Percentiles and histogram per question over all groups matching `criteria`.
+
+    Histograms are merged in the database; no answer rows are read.
+    """
+    bins_by_question = {}
+    for row in await _merged_histograms(db, [GroupQuestionHistogram.question_code], criteria):
+        bins_by_question.setdefault(row.question_code, []).append((row.value, row.count))
+
+    return {
+        question_code: distribution_from_histogram(bins)
+        for question_code, bins in bins_by_question.items()
+    }
+
+async def get_percentiles_by_group(db: AsyncSession, *criteria) -> dict:
+    """{group_id: {question_code: percentiles}} for all groups matching `criteria`"""
+    bins = {}
+    key_columns = [GroupQuestionHistogram.group_id, GroupQuestionHistogram.question_code]
+    for row in await _merged_histograms(db, key_columns, criteria):
+        bins.setdefault((row.group_id, row.question_code), []).append((row.value, row.count))
+
+    result = {}
+    for (group_id, question_code), question_bins in bins.items():
+        result.setdefault(group_id, {})[question_code] = percentiles_from_histogram(question_bins)
+    return result
+
+async def rebuild_histograms(db: AsyncSession) -> int:
+    """Recompute group_question_histograms from raw answers, returns the number of rows.
+
+    The database groups answers by distinct value; only those (few) distinct
+    values are binned here.
+    """
+    await db.execute(text("LOCK TABLE group_question_histograms IN EXCLUSIVE MODE"))
+    await db.execute(delete(GroupQuestionHistogram))
+
+    result = await db.stream(
+        select(
+            SurveyLink.group_id,
+            SurveyAnswer.question_code,
+            SurveyAnswer.numeric_value,
+            func.count().label("count")
+        )
+        .join(SurveySubmission, SurveySubmission.id == SurveyAnswer.submission_id)
+        .join(SurveyLink, SurveyLink.id == SurveySubmission.survey_link_id)
+        .where(usable_numeric_answer(), SurveyLink.group_id.isnot(None))
+        .group_by(SurveyLink.group_id, SurveyAnswer.question_code, SurveyAnswer.numeric_value)
+    )
+    counts = Counter()
+    async for row in result:
+        counts[(row.group_id, row.question_code, histogram_bin(row.numeric_value))] += row.count
+
+    rows = [
+        {"group_id": group_id, "question_code": question_code, "value": value, "count": count}
+        for (group_id, question_code, value), count in counts.items()
+    ]
+    if rows:
+        await db.execute(insert(GroupQuestionHistogram), rows)
+    await db.commit()
+    return len(rows)
@@ -1,29 +1,34 @@
-from sqlalchemy.orm import Session
-from app.models import Faculty, Group, SurveyAnswer, SurveySubmission, SurveyLink, Survey, Curator
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from app.models import Faculty, Group, SurveyAnswer, SurveySubmission, SurveyLink, Survey, Curator, GroupQuestionStats, GroupQuestionRollup, GroupQuestionHistogram
 from app.schemas import FacultyCreate, FacultyUpdate, GroupCreate, GroupUpdate
+from services.survey_service import bump_statistics_version
+from services.link_service import invalidate_link
 
-def create_faculty(db: Session, faculty_data: FacultyCreate) -> Faculty:
+async def create_faculty(db: AsyncSession, faculty_data: FacultyCreate) -> Faculty:
     """Create new faculty"""
     faculty = Faculty(
         name=faculty_data.name,
         description=faculty_data.description
     )
     db.add(faculty)
-    db.commit()
-    db.refresh(faculty)
+    await db.commit()
+    await db.refresh(faculty)
     return faculty
 
-def get_faculty(db: Session, faculty_id: int) -> Faculty:
+async def get_faculty(db: AsyncSession, faculty_id: int) -> Faculty:
     """Get faculty by ID"""
-    return db.query(Faculty).filter(Faculty.id == faculty_id).first()
+    return await db.get(Faculty, faculty_id)
 
-def get_faculties(db: Session, skip: int = 0, limit: int = 100):
+async def get_faculties(db: AsyncSession, skip: int = 0, limit: int = 100):
     """Get all faculties"""
-    return db.query(Faculty).offset(skip).limit(limit).all()
+    result = await db.execute(select(Faculty).offset(skip).limit(limit))
+    return result.scalars().all()
 
-def update_faculty(db: Session, faculty_id: int, faculty_data: FacultyUpdate) -> Faculty:
+async def update_faculty(db: AsyncSession, faculty_id: int, faculty_data: FacultyUpdate) -> Faculty:
     """Update faculty"""
-    faculty = db.query(Faculty).filter(Faculty.id == faculty_id).first()
+    faculty = await db.get(Faculty, faculty_id)
     if not faculty:
         return None
 
@@ -32,21 +37,23 @@ def update_faculty(db: Session, faculty_id: int, faculty_data: FacultyUpdate) ->
     if faculty_data.description is not None:
         faculty.description = faculty_data.description
 
-    db.commit()
-    db.refresh(faculty)
+    await db.commit()
+    await bump_statistics_version()
+    await db.refresh(faculty)
     return faculty
 
-def delete_faculty(db: Session, faculty_id: int) -> bool:
+async def delete_faculty(db: AsyncSession, faculty_id: int) -> bool:
     """Delete faculty"""
-    faculty = db.query(Faculty).filter(Faculty.id == faculty_id).first()
+    faculty = await db.get(Faculty, faculty_id)
     if not faculty:
         return False
 
-    db.delete(faculty)
-    db.commit()
+    await db.delete(faculty)
+    await db.commit()
+    await bump_statistics_version()
     return True
 
-def create_group(db: Session, group_data: GroupCreate) -> Group:
+async def create_group(db: AsyncSession, group_data: GroupCreate) -> Group:
     """Create new group"""
     group = Group(
         name=group_data.name,
@@ -54,21 +61,31 @@ def create_group(db: Session, group_data: GroupCreate) -> Group:
         year=group_data.year
     )
     db.add(group)
-    db.commit()
-    db.refresh(group)
+    await db.commit()
+    await bump_statistics_version()
+    await db.refresh(group)
     return group
 
-def get_group(db: Session, group_id: int) -> Group:
-    """Get group by ID"""
-    return db.query(Group).filter(Group.id == group_id).first()
+async def get_group(db: AsyncSession, group_id: int) -> Group:
+    """Get group by ID (with its faculty loaded)"""
+    result = await db.execute(
+        select(Group)
+        .options(joinedload(Group.faculty))
+        .where(Group.id == group_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
 
-def get_groups(db: Session, skip: int = 0, limit: int = 100):
-    """Get all groups"""
-    return db.query(Group).offset(skip).limit(limit).all()
+async def get_groups(db: AsyncSession, skip: int = 0, limit: int = 100):
+    """Get all groups (with their faculties loaded)"""
+    result = await db.execute(
+        select(Group).options(joinedload(Group.faculty)).offset(skip).limit(limit)
+    )
+    return result.scalars().all()
 
-def update_group(db: Session, group_id: int, group_data: GroupUpdate) -> Group:
+async def update_group(db: AsyncSession, group_id: int, group_data: GroupUpdate) -> Group:
     """Update group"""
-    group = db.query(Group).filter(Group.id == group_id).first()
+    group = await db.get(Group, group_id)
     if not group:
         return None
 
@@ -79,38 +96,69 @@ def update_group(db: Session, group_id: int, group_data: GroupUpdate) -> Group:
     if group_data.year is not None:
         group.year = group_data.year
 
-    db.commit()
-    db.refresh(group)
-    return group
+    await db.commit()
+    await bump_statistics_version()
+    # Reload with the (possibly changed) faculty for the response
+    return await get_group(db, group_id)
 
-def delete_group(db: Session, group_id: int) -> bool:
+async def delete_group(db: AsyncSession, group_id: int) -> bool:
     """Delete group"""
-    group = db.query(Group).filter(Group.id == group_id).first()
+    group = await db.get(Group, group_id)
     if not group:
         return False
 
     try:
-        survey_ids = [sid for (sid,) in db.query(Survey.id).filter(Survey.group_id == group_id).all()]
-        if survey_ids:
-            db.query(SurveyAnswer).filter(SurveyAnswer.survey_id.in_(survey_ids)).delete(synchronize_session=False)
-
-        link_ids = [lid for (lid,) in db.query(SurveyLink.id).filter(SurveyLink.group_id == group_id).all()]
-        if link_ids:
-            submission_ids = [sid for (sid,) in db.query(SurveySubmission.id).filter(SurveySubmission.survey_link_id.in_(link_ids)).all()]
-            if submission_ids:
-                db.query(SurveyAnswer).filter(SurveyAnswer.submission_id.in_(submission_ids)).delete(synchronize_session=False)
-
-            db.query(SurveySubmission).filter(SurveySubmission.survey_link_id.in_(link_ids)).delete(synchronize_session=False)
-
-        db.query(SurveyLink).filter(SurveyLink.group_id == group_id).delete(synchronize_session=False)
-
-        db.query(Survey).filter(Survey.group_id == group_id).delete(synchronize_session=False)
-
-        db.query(Curator).filter(Curator.group_id == group_id).delete(synchronize_session=False)
-
-        db.delete(group)
-        db.commit()
+        survey_ids = select(Survey.id).where(Survey.group_id == group_id)
+        await db.execute(
+            delete(SurveyAnswer).where(SurveyAnswer.survey_id.in_(survey_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+        link_ids = select(SurveyLink.id).where(SurveyLink.group_id == group_id)
+        submission_ids = select(SurveySubmission.id).where(SurveySubmission.survey_link_id.in_(link_ids))
+        await db.execute(
+            delete(SurveyAnswer).where(SurveyAnswer.submission_id.in_(submission_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            delete(SurveySubmission).where(SurveySubmission.survey_link_id.in_(link_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+        await db.execute(
+            delete(SurveyLink).where(SurveyLink.group_id == group_id)
+            .execution_options(synchronize_session=False)
+        )
+
+        await db.execute(
+            delete(Survey).where(Survey.group_id == group_id)
+            .execution_options(synchronize_session=False)
+        )
+
+        await db.execute(
+            delete(Curator).where(Curator.group_id == group_id)
+            .execution_options(synchronize_session=False)
+        )
+
+        await db.execute(
+            delete(GroupQuestionStats).where(GroupQuestionStats.group_id == group_id)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            delete(GroupQuestionRollup).where(GroupQuestionRollup.group_id == group_id)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            delete(GroupQuestionHistogram).where(GroupQuestionHistogram.group_id == group_id)
+            .execution_options(synchronize_session=False)
+        )
+
+        await db.delete(group)
+        await db.commit()
+        await bump_statistics_version()
+        # The group's links and survey are gone
+        invalidate_link()
         return True
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise
@@ -0,0 +1,228 @@
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Iterator, Optional
+import csv
+import hashlib
+import math
+import os
+import time
+from core.database import AsyncSessionLocal
+from app.models import Group, ImportBatch
+from app.schemas import SurveyAnswerCreate
+from services.ingestion_service import allocate_submission_ids
+from services.link_service import get_public_link
+from services.statistics_service import AggregateDelta
+
+SUBMISSION_COLUMNS = ["id", "survey_link_id", "submitted_at"]
+ANSWER_COLUMNS = ["submission_id", "survey_id", "question_code", "question_text",
+                  "numeric_value", "text_value", "created_at"]
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    submissions: int = 0
+    answers: int = 0
+    skipped: Counter = field(default_factory=Counter)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def iter_source_chunks(path: str, fmt: str, chunk_size: int) -> Iterator[list[dict]]:
+    """Rows of a CSV or Parquet file as dicts, `chunk_size` at a time"""
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet input needs the pyarrow package")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+        return
+
+    # utf-8-sig: spreadsheet exports usually start with a BOM
+    with open(path, newline="", encoding="utf-8-sig") as source:
+        chunk = []
+        for row in csv.DictReader(source):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def _parse_submitted_at(value) -> Optional[datetime]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        moment = datetime.fromisoformat(str(value).strip())
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    # Rollups bucket by the UTC date, as rebuild_rollups does
+    return moment.astimezone(timezone.utc)
+
+def _parse_answer(column: str, question_code: str, value) -> Optional[SurveyAnswerCreate]:
+    """Numeric or text answer of one cell; None for missing values.
+
+    NaN/inf (how pandas writes missing cells) count as missing: one of them
+    in the running sums would poison the group's statistics for good.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        if not math.isfinite(value):
+            return None
+        return SurveyAnswerCreate(question_code=question_code, question_text=column, numeric_value=float(value))
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        number = float(value.replace(",", "."))
+    except ValueError:
+        return SurveyAnswerCreate(question_code=question_code, question_text=column, text_value=value)
+    if not math.isfinite(number):
+        return None
+    return SurveyAnswerCreate(question_code=question_code, question_text=column, numeric_value=number)
+
+async def _secondary_indexes(db: AsyncSession, table: str) -> list:
+    """(name, definition) of the non-unique indexes of a table"""
+    result = await db.execute(
+        text("SELECT indexname, indexdef FROM pg_indexes "
+             "WHERE schemaname = current_schema() AND tablename = :table "
+             "AND indexdef NOT LIKE 'CREATE UNIQUE%'"),
+        {"table": table}
+    )
+    return result.all()
+
+async def import_responses(db: AsyncSession, path: str, group_column: str,
+                           questions: Optional[dict] = None, submitted_at_column: Optional[str] = None,
+                           fmt: str = "csv", chunk_size: int = 5000, defer_indexes: bool = False,
+                           on_progress: Optional[Callable[[ImportReport], None]] = None) -> Optional[ImportReport]:
+    """Bulk-load one source file with COPY, in one transaction; None if it was already imported.
+
+    Every row is one submission of the group named in `group_column`, made
+    through the group's public link. `questions` maps source columns to
+    question codes; by default every other column is a question named by
+    its header. Aggregate changes are collected in memory and applied in
+    one step just before commit, so live submissions only wait on the
+    aggregate rows for that step. With `defer_indexes` the non-unique
+    indexes of survey_answers are dropped during the load and rebuilt
+    before commit; that locks the table for the whole import, so only use
+    it offline.
+    """
+    source_sha256 = file_sha256(path)
+    if await db.scalar(select(ImportBatch.id).where(ImportBatch.source_sha256 == source_sha256)):
+        return None
+
+    # Group names are resolved once; public links on first use, outside the import transaction
+    result = await db.execute(select(Group.name, Group.id))
+    group_ids = {name: group_id for name, group_id in result}
+    links = {}
+
+    async def group_link(group_id: int):
+        if group_id not in links:
+            async with AsyncSessionLocal() as link_db:
+                links[group_id] = await get_public_link(link_db, group_id)
+        return links[group_id]
+
+    report = ImportReport()
+    delta = AggregateDelta()
+    started = time.perf_counter()
+    connection = await db.connection()
+    driver = (await connection.get_raw_connection()).driver_connection
+
+    try:
+        # A maintenance load: index rebuilds and large COPYs may exceed the request statement timeout
+        await db.execute(text("SET LOCAL statement_timeout = 0"))
+
+        dropped_indexes = []
+        if defer_indexes:
+            dropped_indexes = await _secondary_indexes(db, "survey_answers")
+            for name, _ in dropped_indexes:
+                await db.execute(text(f'DROP INDEX "{name}"'))
+
+        for rows in iter_source_chunks(path, fmt, chunk_size):
+            report.rows += len(rows)
+            question_columns = questions or {
+                column: column for column in rows[0] if column not in (group_column, submitted_at_column)
+            }
+
+            pending = []
+            for row in rows:
+                group_id = group_ids.get(str(row.get(group_column) or "").strip())
+                if group_id is None:
+                    report.skipped["unknown group"] += 1
+                    continue
+                try:
+                    submitted_at = _parse_submitted_at(row.get(submitted_at_column)) if submitted_at_column else None
+                except ValueError:
+                    report.skipped["bad timestamp"] += 1
+                    continue
+                answers = [
+                    answer for column, code in question_columns.items()
+                    if (answer := _parse_answer(column, code, row.get(column))) is not None
+                ]
+                if not answers:
+                    report.skipped["no answers"] += 1
+                    continue
+                pending.append((await group_link(group_id), submitted_at or datetime.now(timezone.utc), answers))
+
+            if pending:
+                ids = await allocate_submission_ids(db, len(pending))
+                await driver.copy_records_to_table(
+                    "survey_submissions", columns=SUBMISSION_COLUMNS,
+                    records=[(submission_id, link.link_id, submitted_at)
+                             for submission_id, (link, submitted_at, _) in zip(ids, pending)]
+                )
+                answer_records = [
+                    (submission_id, link.survey_id, answer.question_code, answer.question_text,
+                     answer.numeric_value, answer.text_value, submitted_at)
+                    for submission_id, (link, submitted_at, answers) in zip(ids, pending)
+                    for answer in answers
+                ]
+                await driver.copy_records_to_table(
+                    "survey_answers", columns=ANSWER_COLUMNS, records=answer_records
+                )
+
+                for link, submitted_at, answers in pending:
+                    delta.add(link.group_id, answers, submitted_at)
+
+                report.submissions += len(pending)
+                report.answers += len(answer_records)
+
+            report.seconds = time.perf_counter() - started
+            if on_progress:
+                on_progress(report)
+
+        for _, definition in dropped_indexes:
+            await db.execute(text(definition))
+
+        # Last, so the aggregate rows live submissions also update are locked only briefly
+        await delta.apply(db)
+
+        db.add(ImportBatch(
+            source_sha256=source_sha256,
+            source_name=os.path.basename(path),
+            rows=report.rows,
+            submissions=report.submissions,
+            answers=report.answers
+        ))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    report.seconds = time.perf_counter() - started
+    return report
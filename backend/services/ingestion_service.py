@@ -0,0 +1,340 @@
+from sqlalchemy import text, insert, select
+from sqlalchemy.exc import DBAPIError, IntegrityError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+import asyncio
+import time
+from core.config import settings
+from core.database import AsyncSessionLocal
+from app.models import SurveySubmission, SurveyAnswer
+from app.schemas import SurveyAnswerCreate
+from services.statistics_service import record_submission_stats
+from services.survey_service import bump_statistics_version
+
+# PostgreSQL allows 32767 bind parameters per statement; answers have 6 columns
+ANSWER_ROWS_PER_STATEMENT = 5000
+
+# Backoff between attempts to write a batch while the database is unavailable
+RETRY_INITIAL_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+
+# SQLSTATE classes worth retrying: connection exceptions, transaction rollback
+# (serialization failure, deadlock), insufficient resources, operator intervention
+TRANSIENT_SQLSTATES = ("08", "40", "53", "57P")
+
+class IngestionQueueFull(Exception):
+    """The write-behind queue stayed full for the whole enqueue timeout"""
+
+class RetryableWriteError(Exception):
+    """The database was unavailable; `pending` lists the submissions not written yet"""
+
+    def __init__(self, pending: list, cause: BaseException):
+        super().__init__(str(cause))
+        self.pending = pending
+        self.cause = cause
+
+def is_transient_error(error: BaseException) -> bool:
+    """Whether a failed write may succeed if simply retried (outage, failover, pool timeout, deadlock)"""
+    if isinstance(error, (OSError, asyncio.TimeoutError, PoolTimeoutError, InterfaceError)):
+        return True
+    if isinstance(error, DBAPIError):
+        if error.connection_invalidated:
+            return True
+        sqlstate = getattr(error.orig, "sqlstate", None) or getattr(error.orig, "pgcode", None)
+        if sqlstate:
+            return sqlstate.startswith(TRANSIENT_SQLSTATES)
+        return isinstance(error, OperationalError)
+    return False
+
+@dataclass
+class PendingSubmission:
+    submission_id: int
+    survey_link_id: int
+    group_id: Optional[int]
+    survey_id: Optional[int]
+    submitted_at: datetime
+    answers: list[SurveyAnswerCreate]
+
+async def write_submissions(db: AsyncSession, batch: list[PendingSubmission]):
+    """Insert a batch of submissions with their answers and aggregates (caller commits)"""
+    await db.execute(insert(SurveySubmission).values([
+        {"id": item.submission_id, "survey_link_id": item.survey_link_id, "submitted_at": item.submitted_at}
+        for item in batch
+    ]))
+
+    answer_rows = [
+        {
+            "submission_id": item.submission_id,
+            "survey_id": item.survey_id,
+            "question_code": answer.question_code,
+            "question_text": answer.question_text,
+            "numeric_value": answer.numeric_value,
+            "text_value": answer.text_value
+        }
+        for item in batch
+        for answer in item.answers
+    ]
+    for start in range(0, len(answer_rows), ANSWER_ROWS_PER_STATEMENT):
+        await db.execute(insert(SurveyAnswer).values(answer_rows[start:start + ANSWER_ROWS_PER_STATEMENT]))
+
+    # One aggregate upsert per group and day: the day also fixes the week bucket
+    answers_by_bucket = {}
+    for item in batch:
+        if item.group_id is None:
+            continue
+        key = (item.group_id, item.submitted_at.date())
+        entry = answers_by_bucket.setdefault(key, (item.submitted_at, []))
+        entry[1].extend(item.answers)
+    # Sorted so concurrent batches lock aggregate rows in the same order
+    for (group_id, _), (submitted_at, answers) in sorted(answers_by_bucket.items(), key=lambda item: item[0]):
+        await record_submission_stats(db, group_id, answers, submitted_at)
+
+async def allocate_submission_ids(db: AsyncSession, count: int) -> list[int]:
+    """Reserve `count` ids from the survey_submissions sequence in one round trip"""
+    result = await db.execute(
+        text("SELECT nextval(pg_get_serial_sequence('survey_submissions', 'id')) "
+             "FROM generate_series(1, :n)"),
+        {"n": count}
+    )
+    return [row[0] for row in result]
+
+async def _write_transaction(batch: list[PendingSubmission]):
+    async with AsyncSessionLocal() as db:
+        await write_submissions(db, batch)
+        await db.commit()
+
+async def _is_written(submission_id: int) -> bool:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(SurveySubmission.id).where(SurveySubmission.id == submission_id)) is not None
+
+async def write_batch(batch: list[PendingSubmission]) -> dict:
+    """Write a batch in one transaction; if the database rejects it, retry its submissions one by one.
+
+    Returns {submission_id: error message} for submissions the database
+    rejected (bad data). Raises RetryableWriteError with the submissions not
+    written yet when the database is unavailable, so nothing is lost to an
+    outage.
+    """
+    errors = {}
+    try:
+        try:
+            await _write_transaction(batch)
+        except Exception as e:
+            if is_transient_error(e):
+                raise RetryableWriteError(batch, e) from e
+            print(f"Submission batch of {len(batch)} failed, retrying individually: {e}")
+            for i, item in enumerate(batch):
+                try:
+                    await _write_transaction([item])
+                except Exception as item_error:
+                    if is_transient_error(item_error):
+                        raise RetryableWriteError(batch[i:], item_error) from item_error
+                    if isinstance(item_error, IntegrityError):
+                        # Committed by an earlier attempt whose outcome was lost with the connection?
+                        try:
+                            if await _is_written(item.submission_id):
+                                continue
+                        except Exception as check_error:
+                            raise RetryableWriteError(batch[i:], check_error) from check_error
+                    errors[item.submission_id] = str(item_error)
+    finally:
+        for group_id in {item.group_id for item in batch if item.group_id is not None}:
+            await bump_statistics_version(group_id)
+    return errors
+
+class IngestionQueue:
+    """Bounded write-behind queue of submissions flushed in batches by one background task.
+
+    Submissions are acknowledged with an id taken from the table's sequence
+    (allocated in blocks) before they are written, so an acknowledged
+    submission can be lost if the process dies before its batch commits.
+    While the database is unavailable the batch is retried with backoff
+    (the queue fills up and enqueue starts rejecting); only submissions the
+    database rejects, or that are still unwritten when shutdown gives up,
+    are dropped, and counted in `dropped`.
+    """
+
+    _STOP = object()
+
+    def __init__(self, maxsize: int, batch_size: int, flush_interval: float, enqueue_timeout: float):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.closed = False
+        self._task: Optional[asyncio.Task] = None
+
+        self._ids: deque = deque()
+        self._id_lock = asyncio.Lock()
+
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.dropped = 0
+        self.retries = 0
+        self.retrying = False
+        self.last_error: Optional[str] = None
+        self.batches = 0
+        self._give_up_at = float("inf")
+        self.last_batch_size = 0
+        self.last_flush_seconds = 0.0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="submission-ingestion")
+
+    async def _allocate_id(self, db: AsyncSession) -> int:
+        async with self._id_lock:
+            if not self._ids:
+                self._ids = deque(await allocate_submission_ids(db, self.batch_size))
+            return self._ids.popleft()
+
+    async def enqueue(self, db: AsyncSession, survey_link_id: int, group_id: Optional[int],
+                      survey_id: Optional[int], answers: list[SurveyAnswerCreate]) -> int:
+        """Queue a validated submission, returns its submission id"""
+        if self.closed:
+            raise IngestionQueueFull("ingestion queue is shutting down")
+
+        item = PendingSubmission(
+            submission_id=await self._allocate_id(db),
+            survey_link_id=survey_link_id,
+            group_id=group_id,
+            survey_id=survey_id,
+            submitted_at=datetime.now(timezone.utc),
+            answers=answers
+        )
+        try:
+            await asyncio.wait_for(self.queue.put(item), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise IngestionQueueFull("ingestion queue is full")
+        self.accepted += 1
+        return item.submission_id
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is self._STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self.flush(batch)
+
+    def _drop(self, count: int, reason: str):
+        self.dropped += count
+        print(f"ERROR: dropped {count} acknowledged submission(s): {reason}")
+
+    async def flush(self, batch: list[PendingSubmission]):
+        """Write a batch, retrying with backoff while the database is unavailable"""
+        started = time.perf_counter()
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        delay = RETRY_INITIAL_DELAY
+        while batch:
+            try:
+                errors = await write_batch(batch)
+            except RetryableWriteError as e:
+                self.written += len(batch) - len(e.pending)
+                batch = e.pending
+                self.last_error = str(e.cause)
+                if self.closed and time.monotonic() >= self._give_up_at:
+                    self._drop(len(batch), f"database still unavailable at shutdown: {e.cause}")
+                    break
+                self.retrying = True
+                self.retries += 1
+                print(f"Writing {len(batch)} queued submissions failed, retrying in {delay:.1f}s: {e.cause}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+                continue
+
+            for submission_id, error in errors.items():
+                self._drop(1, f"submission {submission_id} rejected by the database: {error}")
+            self.written += len(batch) - len(errors)
+            break
+
+        self.retrying = False
+        self.last_flush_seconds = time.perf_counter() - started
+
+    async def close(self):
+        """Stop accepting submissions and write everything still queued"""
+        self.closed = True
+        self._give_up_at = time.monotonic() + settings.ingest_shutdown_retry_seconds
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            # A full queue only drains while the flusher runs; don't wait on put() if it dies
+            stop = asyncio.create_task(self.queue.put(self._STOP))
+            await asyncio.wait({stop, task}, return_when=asyncio.FIRST_COMPLETED)
+            if stop.done():
+                await asyncio.wait({task})
+            else:
+                stop.cancel()
+        if task is not None and not task.cancelled() and task.exception() is not None:
+            print(f"Submission flusher had stopped: {task.exception()!r}")
+
+        # Anything enqueued while the stop marker was on its way
+        leftovers = []
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is not self._STOP:
+                leftovers.append(item)
+        for start in range(0, len(leftovers), self.batch_size):
+            await self.flush(leftovers[start:start + self.batch_size])
+
+    def stats(self) -> dict:
+        return {
+            # Acknowledged to the user but never stored
+            "dropped": self.dropped,
+            "retrying": self.retrying,
+            "retries": self.retries,
+            "last_error": self.last_error,
+            "queued": self.queue.qsize(),
+            "maxsize": self.queue.maxsize,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+# Created by the app lifespan when INGEST_MODE=queued
+ingestion_queue: Optional[IngestionQueue] = None
+
+def start_ingestion():
+    global ingestion_queue
+    ingestion_queue = IngestionQueue(
+        settings.ingest_queue_size,
+        settings.ingest_batch_size,
+        settings.ingest_flush_interval_ms / 1000,
+        settings.ingest_enqueue_timeout_seconds
+    )
+    ingestion_queue.start()
+
+async def stop_ingestion():
+    """Drain the queue on shutdown"""
+    global ingestion_queue
+    if ingestion_queue is not None:
+        await ingestion_queue.close()
+        ingestion_queue = None
+
+def get_ingestion_metrics() -> dict:
+    if ingestion_queue is None:
+        return {"mode": "direct"}
+    return {"mode": "queued", **ingestion_queue.stats()}
@@ -1,8 +1,230 @@
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 import secrets
-import string
+from core.cache import TTLCache, MISSING
+from core.config import settings
+from app.models import SurveyLink, SurveySubmission, Survey, Group
+from app.schemas import SurveyLinkUpdate
+from services.survey_service import get_group_survey_id
 
 def generate_unique_token(length: int = 32) -> str:
-    """Generate unique token for survey link"""
-    alphabet = string.ascii_letters + string.digits
-    token = ''.join(secrets.choice(alphabet) for _ in range(length))
-    return token
+    """Generate unique token for survey link (URL-safe, 6 random bits per character)"""
+    return secrets.token_urlsafe(length * 3 // 4 + 1)[:length]
+
+def survey_link_url(token: str) -> str:
+    """Frontend URL of a survey link"""
+    return f"{settings.frontend_url.rstrip('/')}/survey/{token}"
+
+@dataclass(frozen=True)
+class ResolvedLink:
+    """What the submit path needs to know about a survey link token"""
+    link_id: int
+    group_id: Optional[int]
+    survey_id: Optional[int]
+    is_active: bool
+    expires_at: Optional[datetime]
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        if self.expires_at is None:
+            return False
+        now = now or datetime.now(timezone.utc)
+        expires_at = self.expires_at
+        if expires_at.tzinfo is None:
+            # Naive values were written as UTC
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at <= now
+
+# token -> ResolvedLink (or None for unknown tokens). Link edits in this process
+# invalidate entries; other workers pick them up after the TTL.
+link_cache = TTLCache(settings.link_cache_size, settings.link_cache_ttl_seconds)
+
+async def resolve_link(db: AsyncSession, token: str) -> Optional[ResolvedLink]:
+    """Resolve a survey link token, from memory when possible (one indexed query otherwise)"""
+    cached = link_cache.get(token)
+    if cached is not MISSING:
+        return cached
+
+    result = await db.execute(
+        select(
+            SurveyLink.id,
+            SurveyLink.group_id,
+            SurveyLink.is_active,
+            SurveyLink.expires_at,
+            Survey.id.label("survey_id")
+        )
+        .outerjoin(Survey, Survey.group_id == SurveyLink.group_id)
+        .where(SurveyLink.unique_token == token)
+        .order_by(Survey.id)
+        .limit(1)
+    )
+    row = result.first()
+    if row is None:
+        # Keep misses briefly so random tokens can't hammer the database
+        link_cache.set(token, None, settings.link_cache_negative_ttl_seconds)
+        return None
+
+    survey_id = row.survey_id
+    if survey_id is None and row.group_id is not None:
+        survey_id = await get_group_survey_id(db, row.group_id)
+        await db.commit()
+
+    link = ResolvedLink(row.id, row.group_id, survey_id, bool(row.is_active), row.expires_at)
+    link_cache.set(token, link)
+    return link
+
+# group_id -> ResolvedLink of the group's public link (None for unknown groups)
+public_link_cache = TTLCache(settings.link_cache_size, settings.link_cache_ttl_seconds)
+
+async def get_public_link(db: AsyncSession, group_id: int) -> Optional[ResolvedLink]:
+    """The group's shared public link, created on first use; None if the group doesn't exist"""
+    cached = public_link_cache.get(group_id)
+    if cached is not MISSING:
+        return cached
+
+    if await db.get(Group, group_id) is None:
+        public_link_cache.set(group_id, None, settings.link_cache_negative_ttl_seconds)
+        return None
+
+    # Concurrent first submissions race on the partial unique index; the loser reads the winner's row
+    await db.execute(
+        insert(SurveyLink)
+        .values(unique_token=generate_unique_token(), group_id=group_id, is_active=True, is_public=True)
+        .on_conflict_do_nothing(index_elements=[SurveyLink.group_id], index_where=SurveyLink.is_public)
+    )
+    token = await db.scalar(
+        select(SurveyLink.unique_token).where(SurveyLink.group_id == group_id, SurveyLink.is_public)
+    )
+    await db.commit()
+
+    link = await resolve_link(db, token)
+    public_link_cache.set(group_id, link)
+    return link
+
+def invalidate_link(token: Optional[str] = None):
+    """Drop a token from the resolver cache, or every token (and public link) when omitted"""
+    if token is None:
+        link_cache.clear()
+        public_link_cache.clear()
+    else:
+        link_cache.delete(token)
+
+async def update_survey_link(db: AsyncSession, link_id: int, link_data: SurveyLinkUpdate) -> SurveyLink:
+    """Activate/deactivate a link or change its expiry"""
+    link = await db.get(SurveyLink, link_id)
+    if not link:
+        return None
+
+    if link_data.is_active is not None:
+        link.is_active = link_data.is_active
+    if "expires_at" in link_data.model_fields_set:
+        link.expires_at = link_data.expires_at
+
+    await db.commit()
+    invalidate_link(link.unique_token)
+    if link.is_public:
+        public_link_cache.delete(link.group_id)
+    await db.refresh(link)
+    return link
+
+# Four bound columns per link keeps a chunk far below PostgreSQL's 32767 parameters
+BULK_LINK_CHUNK_SIZE = 5000
+BULK_LINK_ATTEMPTS = 5
+
+async def create_group_links(db: AsyncSession, group_ids: list[int], expires_at: Optional[datetime] = None) -> list:
+    """Create one link per group with multi-row inserts and commit; returns the new rows.
+
+    A token that collides with an existing one is skipped by ON CONFLICT and
+    only those groups get new tokens on the next attempt.
+    """
+    created = []
+    for start in range(0, len(group_ids), BULK_LINK_CHUNK_SIZE):
+        remaining = group_ids[start:start + BULK_LINK_CHUNK_SIZE]
+        for _ in range(BULK_LINK_ATTEMPTS):
+            pending = [(generate_unique_token(), group_id) for group_id in remaining]
+            result = await db.execute(
+                insert(SurveyLink)
+                .values([
+                    {"unique_token": token, "group_id": group_id, "expires_at": expires_at, "is_active": True}
+                    for token, group_id in pending
+                ])
+                .on_conflict_do_nothing(index_elements=[SurveyLink.unique_token])
+                .returning(SurveyLink.id, SurveyLink.unique_token, SurveyLink.group_id,
+                           SurveyLink.created_at, SurveyLink.expires_at, SurveyLink.is_active)
+            )
+            rows = result.all()
+            created.extend(rows)
+            inserted = {(row.unique_token, row.group_id) for row in rows}
+            remaining = [group_id for token, group_id in pending if (token, group_id) not in inserted]
+            if not remaining:
+                break
+        else:
+            await db.rollback()
+            raise RuntimeError(f"Could not generate unique tokens for {len(remaining)} groups")
+
+    await db.commit()
+    # Forget cached "unknown token" answers for the new tokens
+    for row in created:
+        invalidate_link(row.unique_token)
+    return created
+
+FOLD_CHUNK_SIZE = 1000
+
+def _throwaway_links():
+    """Links made per submission by the old /submit-group: not public, one hour of validity, at most one submission"""
+    submission_count = (
+        select(func.count(SurveySubmission.id))
+        .where(SurveySubmission.survey_link_id == SurveyLink.id)
+        .scalar_subquery()
+    )
+    return (
+        select(SurveyLink.id, SurveyLink.group_id)
+        .where(
+            SurveyLink.is_public.is_(False),
+            SurveyLink.group_id.isnot(None),
+            SurveyLink.expires_at.between(
+                SurveyLink.created_at + timedelta(minutes=55), SurveyLink.created_at + timedelta(minutes=65)
+            ),
+            submission_count <= 1
+        )
+    )
+
+async def fold_throwaway_links(db: AsyncSession, dry_run: bool = False) -> dict:
+    """Move submissions of throwaway links onto their group's public link and delete those links"""
+    result = await db.execute(_throwaway_links())
+    links = result.all()
+    summary = {"links": len(links), "groups": len({link.group_id for link in links})}
+    if dry_run or not links:
+        return summary
+
+    public_ids = {}
+    for group_id in sorted({link.group_id for link in links}):
+        public = await get_public_link(db, group_id)
+        public_ids[group_id] = public.link_id
+
+    moved = 0
+    link_ids_by_group = {}
+    for link in links:
+        link_ids_by_group.setdefault(link.group_id, []).append(link.id)
+    for group_id, link_ids in link_ids_by_group.items():
+        for start in range(0, len(link_ids), FOLD_CHUNK_SIZE):
+            chunk = link_ids[start:start + FOLD_CHUNK_SIZE]
+            result = await db.execute(
+                update(SurveySubmission)
+                .where(SurveySubmission.survey_link_id.in_(chunk))
+                .values(survey_link_id=public_ids[group_id])
+                .execution_options(synchronize_session=False)
+            )
+            moved += result.rowcount
+            await db.execute(
+                delete(SurveyLink).where(SurveyLink.id.in_(chunk))
+                .execution_options(synchronize_session=False)
+            )
+        # One transaction per group keeps locks short on big tables
+        await db.commit()
+
+    summary["submissions_moved"] = moved
+    return summary
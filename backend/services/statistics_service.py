@@ -0,0 +1,341 @@
+from sqlalchemy import select, delete, func, text, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
+from typing import Optional
+import math
+from app.models import SurveyAnswer, SurveySubmission, SurveyLink, Group, GroupQuestionStats, GroupQuestionRollup
+from app.schemas import SurveyAnswerCreate
+from collections import Counter
+from services.distribution_service import (
+    record_submission_histogram, count_histogram_bins, merge_histogram_counts,
+    usable_numeric_value, usable_numeric_answer
+)
+
+def summarize_answers(answers: list[SurveyAnswerCreate]) -> dict:
+    """Per-question count/sum/sum of squares/min/max of one submission's numeric answers"""
+    summary = {}
+    for answer in answers:
+        value = answer.numeric_value
+        if not usable_numeric_value(value):
+            continue
+        entry = summary.get(answer.question_code)
+        if entry is None:
+            summary[answer.question_code] = {
+                "count": 1, "sum": value, "sum_squares": value * value, "min": value, "max": value
+            }
+        else:
+            entry["count"] += 1
+            entry["sum"] += value
+            entry["sum_squares"] += value * value
+            entry["min"] = min(entry["min"], value)
+            entry["max"] = max(entry["max"], value)
+    return summary
+
+def day_bucket(moment: datetime) -> date:
+    return moment.date()
+
+def week_bucket(moment: datetime) -> date:
+    """Monday of the ISO week, same as PostgreSQL date_trunc('week', ...)"""
+    day = moment.date()
+    return day - timedelta(days=day.weekday())
+
+ROLLUP_BUCKETS = {
+    "day": day_bucket,
+    "week": week_bucket,
+}
+
+def _merge_on_conflict(stmt, table, key_columns: list, **extra_set):
+    """ON CONFLICT clause adding the new running sums to the stored ones"""
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c[name] for name in key_columns],
+        set_={
+            "count": table.c.count + stmt.excluded.count,
+            "sum": table.c.sum + stmt.excluded.sum,
+            "sum_squares": table.c.sum_squares + stmt.excluded.sum_squares,
+            "min": func.least(table.c.min, stmt.excluded.min),
+            "max": func.greatest(table.c.max, stmt.excluded.max),
+            **extra_set
+        }
+    )
+
+async def record_submission_stats(db: AsyncSession, group_id: int, answers: list[SurveyAnswerCreate],
+                                  submitted_at: datetime):
+    """Fold a submission's numeric answers into the aggregate tables (caller commits)"""
+    summary = summarize_answers(answers)
+    if not summary:
+        return
+
+    # Rows go in primary key order: concurrent upserts then lock them in the
+    # same order and can't deadlock whatever order the answers came in
+    summary = sorted(summary.items())
+    stmt = insert(GroupQuestionStats).values([
+        {"group_id": group_id, "question_code": question_code, **values}
+        for question_code, values in summary
+    ])
+    await db.execute(_merge_on_conflict(
+        stmt, GroupQuestionStats.__table__, ["group_id", "question_code"], updated_at=func.now()
+    ))
+
+    stmt = insert(GroupQuestionRollup).values([
+        {
+            "group_id": group_id,
+            "question_code": question_code,
+            "granularity": granularity,
+            "bucket_start": bucket(submitted_at),
+            **values
+        }
+        for question_code, values in summary
+        for granularity, bucket in sorted(ROLLUP_BUCKETS.items())
+    ])
+    await db.execute(_merge_on_conflict(
+        stmt, GroupQuestionRollup.__table__, ["group_id", "question_code", "granularity", "bucket_start"]
+    ))
+
+    await record_submission_histogram(db, group_id, answers)
+
+# Nine bound columns per rollup row
+AGGREGATE_ROWS_PER_STATEMENT = 3000
+
+def _merge_summary_entry(entries: dict, key: tuple, values: dict):
+    entry = entries.get(key)
+    if entry is None:
+        entries[key] = dict(values)
+    else:
+        entry["count"] += values["count"]
+        entry["sum"] += values["sum"]
+        entry["sum_squares"] += values["sum_squares"]
+        entry["min"] = min(entry["min"], values["min"])
+        entry["max"] = max(entry["max"], values["max"])
+
+class AggregateDelta:
+    """Aggregate changes of many submissions, applied at once.
+
+    For bulk loads: the stats, rollup and histogram rows touched are
+    upserted in a few multi-row statements at the end, in primary key
+    order, so they stay locked only for that final step.
+    """
+
+    def __init__(self):
+        self.stats: dict = {}
+        self.rollups: dict = {}
+        self.histograms: Counter = Counter()
+
+    def add(self, group_id: int, answers: list[SurveyAnswerCreate], submitted_at: datetime):
+        for question_code, values in summarize_answers(answers).items():
+            _merge_summary_entry(self.stats, (group_id, question_code), values)
+            for granularity, bucket in ROLLUP_BUCKETS.items():
+                _merge_summary_entry(
+                    self.rollups, (group_id, question_code, granularity, bucket(submitted_at)), values
+                )
+        count_histogram_bins(self.histograms, group_id, answers)
+
+    async def apply(self, db: AsyncSession):
+        """Upsert everything collected (caller commits)"""
+        stats_rows = [
+            {"group_id": group_id, "question_code": question_code, **values}
+            for (group_id, question_code), values in sorted(self.stats.items())
+        ]
+        for start in range(0, len(stats_rows), AGGREGATE_ROWS_PER_STATEMENT):
+            stmt = insert(GroupQuestionStats).values(stats_rows[start:start + AGGREGATE_ROWS_PER_STATEMENT])
+            await db.execute(_merge_on_conflict(
+                stmt, GroupQuestionStats.__table__, ["group_id", "question_code"], updated_at=func.now()
+            ))
+
+        rollup_rows = [
+            {
+                "group_id": group_id,
+                "question_code": question_code,
+                "granularity": granularity,
+                "bucket_start": bucket_start,
+                **values
+            }
+            for (group_id, question_code, granularity, bucket_start), values in sorted(self.rollups.items())
+        ]
+        for start in range(0, len(rollup_rows), AGGREGATE_ROWS_PER_STATEMENT):
+            stmt = insert(GroupQuestionRollup).values(rollup_rows[start:start + AGGREGATE_ROWS_PER_STATEMENT])
+            await db.execute(_merge_on_conflict(
+                stmt, GroupQuestionRollup.__table__, ["group_id", "question_code", "granularity", "bucket_start"]
+            ))
+
+        await merge_histogram_counts(db, self.histograms)
+
+def question_stat_from_aggregate(question_code: str, count: int, total: float, sum_squares: float,
+                                 min_value: float, max_value: float) -> dict:
+    """Statistics entry (same keys as get_group_statistics) from running sums"""
+    average = total / count
+    if count > 1:
+        # Sample variance; clamp rounding noise below zero
+        variance = max((sum_squares - total * total / count) / (count - 1), 0.0)
+        stddev = math.sqrt(variance)
+    else:
+        stddev = 0.0
+    return {
+        "question_code": question_code,
+        "average": average,
+        "count": count,
+        "min": min_value,
+        "max": max_value,
+        "stddev": stddev
+    }
+
+def _raw_aggregates_query():
+    """group_question_stats rows recomputed from survey_answers"""
+    numeric_value = SurveyAnswer.numeric_value
+    return (
+        select(
+            SurveyLink.group_id,
+            SurveyAnswer.question_code,
+            func.count(numeric_value).label("count"),
+            func.sum(numeric_value).label("sum"),
+            func.sum(numeric_value * numeric_value).label("sum_squares"),
+            func.min(numeric_value).label("min"),
+            func.max(numeric_value).label("max")
+        )
+        .join(SurveySubmission, SurveySubmission.id == SurveyAnswer.submission_id)
+        .join(SurveyLink, SurveyLink.id == SurveySubmission.survey_link_id)
+        .where(usable_numeric_answer(), SurveyLink.group_id.isnot(None))
+        .group_by(SurveyLink.group_id, SurveyAnswer.question_code)
+    )
+
+async def rebuild_group_question_stats(db: AsyncSession) -> int:
+    """Recompute group_question_stats from raw answers, returns the number of rows"""
+    # Block concurrent submissions from upserting while the table is rebuilt
+    await db.execute(text("LOCK TABLE group_question_stats IN EXCLUSIVE MODE"))
+    await db.execute(delete(GroupQuestionStats))
+
+    raw = _raw_aggregates_query().subquery()
+    await db.execute(
+        insert(GroupQuestionStats).from_select(
+            ["group_id", "question_code", "count", "sum", "sum_squares", "min", "max"],
+            select(raw.c.group_id, raw.c.question_code, raw.c.count, raw.c.sum,
+                   raw.c.sum_squares, raw.c.min, raw.c.max)
+        )
+    )
+    await db.commit()
+
+    return await db.scalar(select(func.count()).select_from(GroupQuestionStats))
+
+def _raw_rollups_query(granularity: str):
+    """group_question_rollups rows of one granularity recomputed from survey_answers"""
+    numeric_value = SurveyAnswer.numeric_value
+    bucket_start = func.date(
+        func.date_trunc(granularity, func.timezone("UTC", SurveySubmission.submitted_at))
+    ).label("bucket_start")
+    return (
+        select(
+            SurveyLink.group_id,
+            SurveyAnswer.question_code,
+            bucket_start,
+            func.count(numeric_value).label("count"),
+            func.sum(numeric_value).label("sum"),
+            func.sum(numeric_value * numeric_value).label("sum_squares"),
+            func.min(numeric_value).label("min"),
+            func.max(numeric_value).label("max")
+        )
+        .join(SurveySubmission, SurveySubmission.id == SurveyAnswer.submission_id)
+        .join(SurveyLink, SurveyLink.id == SurveySubmission.survey_link_id)
+        .where(usable_numeric_answer(), SurveyLink.group_id.isnot(None))
+        .group_by(SurveyLink.group_id, SurveyAnswer.question_code, bucket_start)
+    )
+
+async def rebuild_rollups(db: AsyncSession) -> int:
+    """Recompute group_question_rollups from raw answers, returns the number of rows"""
+    await db.execute(text("LOCK TABLE group_question_rollups IN EXCLUSIVE MODE"))
+    await db.execute(delete(GroupQuestionRollup))
+
+    for granularity in ROLLUP_BUCKETS:
+        raw = _raw_rollups_query(granularity).subquery()
+        await db.execute(
+            insert(GroupQuestionRollup).from_select(
+                ["group_id", "question_code", "granularity", "bucket_start",
+                 "count", "sum", "sum_squares", "min", "max"],
+                select(raw.c.group_id, raw.c.question_code, literal(granularity), raw.c.bucket_start,
+                       raw.c.count, raw.c.sum, raw.c.sum_squares, raw.c.min, raw.c.max)
+            )
+        )
+    await db.commit()
+
+    return await db.scalar(select(func.count()).select_from(GroupQuestionRollup))
+
+async def compact_daily_rollups(db: AsyncSession, older_than: date) -> int:
+    """Fold daily buckets of whole weeks before `older_than` into their weekly bucket.
+
+    The weekly buckets are maintained alongside the daily ones, so folding
+    means dropping the daily rows. Returns the number of rows removed.
+    """
+    cutoff = older_than - timedelta(days=older_than.weekday())
+    result = await db.execute(
+        delete(GroupQuestionRollup)
+        .where(
+            GroupQuestionRollup.granularity == "day",
+            GroupQuestionRollup.bucket_start < cutoff
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+async def get_trend(db: AsyncSession, granularity: str, *criteria,
+                    since: Optional[date] = None, until: Optional[date] = None) -> dict:
+    """Per-question time series from the rollups, keyed by question code.
+
+    Buckets of all groups matching `criteria` (on Group or GroupQuestionRollup
+    columns) are merged, so the cost is O(buckets) regardless of answer volume.
+    """
+    rollup = GroupQuestionRollup
+    query = (
+        select(
+            rollup.bucket_start,
+            rollup.question_code,
+            func.sum(rollup.count).label("count"),
+            func.sum(rollup.sum).label("sum"),
+            func.sum(rollup.sum_squares).label("sum_squares"),
+            func.min(rollup.min).label("min"),
+            func.max(rollup.max).label("max")
+        )
+        .join(Group, Group.id == rollup.group_id)
+        .where(rollup.granularity == granularity, *criteria)
+        .group_by(rollup.question_code, rollup.bucket_start)
+        .order_by(rollup.question_code, rollup.bucket_start)
+    )
+    if since is not None:
+        query = query.where(rollup.bucket_start >= since)
+    if until is not None:
+        query = query.where(rollup.bucket_start <= until)
+
+    series = {}
+    for row in await db.execute(query):
+        if not row.count:
+            continue
+        point = question_stat_from_aggregate(
+            row.question_code, row.count, row.sum, row.sum_squares, row.min, row.max
+        )
+        del point["question_code"]
+        series.setdefault(row.question_code, []).append({"bucket_start": row.bucket_start, **point})
+    return series
+
+async def check_group_question_stats(db: AsyncSession, tolerance: float = 1e-6) -> list:
+    """Compare group_question_stats with raw answers, returns the drifted (group, question) keys"""
+    expected = {
+        (row.group_id, row.question_code): row
+        for row in await db.execute(_raw_aggregates_query())
+    }
+    result = await db.execute(select(GroupQuestionStats))
+    stored = {(row.group_id, row.question_code): row for row in result.scalars()}
+
+    drift = []
+    for key in expected.keys() | stored.keys():
+        want, have = expected.get(key), stored.get(key)
+        if want is None or have is None:
+            drift.append({"group_id": key[0], "question_code": key[1],
+                          "expected_count": want.count if want else 0,
+                          "stored_count": have.count if have else 0})
+            continue
+        if want.count != have.count or any(
+            abs((getattr(want, name) or 0) - (getattr(have, name) or 0)) > tolerance * max(1.0, abs(getattr(want, name) or 0))
+            for name in ("sum", "sum_squares", "min", "max")
+        ):
+            drift.append({"group_id": key[0], "question_code": key[1],
+                          "expected_count": want.count, "stored_count": have.count})
+    return drift
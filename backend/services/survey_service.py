@@ -1,89 +1,287 @@
-from sqlalchemy.orm import Session
-from datetime import datetime
-from app.models import SurveySubmission, SurveyAnswer, Survey, SurveyLink, Group
+from sqlalchemy import select, insert, func, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import Awaitable, Callable, Optional
+from core.cache import MISSING, create_cache_backend
+from core.conditional import make_etag
+from core.config import settings
+from app.models import SurveySubmission, SurveyAnswer, Survey, SurveyLink, Group, Faculty, GroupQuestionStats
 from app.schemas import SurveyAnswerCreate
+from services.statistics_service import record_submission_stats, question_stat_from_aggregate
+from services.distribution_service import get_percentiles_by_group
 
-def create_submission(db: Session, survey_link_id: int, answers: list[SurveyAnswerCreate]) -> SurveySubmission:
-    """Create survey submission with answers"""
+# Cached statistics are keyed by (scope, id, data version). Writers bump the
+# versions they affect instead of deleting entries; stale entries are never
+# read again and age out of the LRU.
+statistics_cache = create_cache_backend(
+    settings.stats_cache_backend,
+    settings.stats_cache_size,
+    settings.stats_cache_ttl_seconds,
+    settings.redis_url,
+    prefix="edupulse:stats"
+)
 
-    # Create submission
-    submission = SurveySubmission(
-        survey_link_id=survey_link_id,
-        submitted_at=datetime.utcnow()
+# Bumped by any change to statistics data
+ALL_VERSION = "all"
+# Bumped when faculties or groups are edited (names in cached payloads)
+STRUCTURE_VERSION = "structure"
+
+def _group_version(group_id: int) -> str:
+    return f"group:{group_id}"
+
+async def bump_statistics_version(group_id: Optional[int] = None):
+    """Invalidate cached statistics of one group, or of every group when omitted (call after commit)"""
+    if group_id is None:
+        await statistics_cache.bump(ALL_VERSION, STRUCTURE_VERSION)
+    else:
+        await statistics_cache.bump(ALL_VERSION, _group_version(group_id))
+
+async def statistics_version(group_id: Optional[int] = None) -> Optional[tuple]:
+    """Current data version of one group's statistics, or of all statistics"""
+    if group_id is None:
+        return await statistics_cache.versions(ALL_VERSION)
+    return await statistics_cache.versions(STRUCTURE_VERSION, _group_version(group_id))
+
+async def cached_statistics(scope: str, scope_id, compute: Callable[[], Awaitable], etag: Optional[str] = None):
+    """Return `compute()` for (scope, id), reusing the result until the data changes.
+
+    With an `etag` (computed from the database) the entry is keyed by it,
+    so the body always matches the ETag sent with it, whichever process or
+    command made the change. Without one, the "group" scope is invalidated
+    by version bumps of that group, any other scope by any bump.
+    """
+    if etag is not None:
+        version = (etag,)
+    else:
+        version = await statistics_version(scope_id if scope == "group" else None)
+        if version is None:
+            return await compute()
+
+    key = (scope, scope_id, *version)
+    value = await statistics_cache.get(key)
+    if value is MISSING:
+        value = await compute()
+        await statistics_cache.set(key, value)
+    return value
+
+def get_statistics_cache_metrics() -> dict:
+    """Statistics cache counters for the admin metrics endpoint"""
+    return statistics_cache.stats()
+
+async def get_group_survey_id(db: AsyncSession, group_id: int) -> int:
+    """Id of the group's survey, created on first use"""
+    survey_id = await db.scalar(select(Survey.id).where(Survey.group_id == group_id).limit(1))
+    if survey_id is None:
+        survey_id = await db.scalar(insert(Survey).values(group_id=group_id).returning(Survey.id))
+    return survey_id
+
+async def create_submission(db: AsyncSession, survey_link_id: int, group_id: int, survey_id: int,
+                            answers: list[SurveyAnswerCreate]) -> int:
+    """Create survey submission with answers, returns the submission id.
+
+    The caller has already resolved the link and the group's survey. One
+    INSERT ... RETURNING for the submission and one multi-row INSERT for
+    the answers; nothing is loaded back.
+    """
+    result = await db.execute(
+        insert(SurveySubmission)
+        .values(survey_link_id=survey_link_id)
+        .returning(SurveySubmission.id, SurveySubmission.submitted_at)
     )
-    db.add(submission)
-    db.flush()
-
-    # Get group from survey link
-    survey_link = db.query(SurveyLink).filter(SurveyLink.id == survey_link_id).first()
-
-    # Create survey if doesn't exist
-    survey = db.query(Survey).filter(Survey.group_id == survey_link.group_id).first()
-    if not survey:
-        survey = Survey(group_id=survey_link.group_id)
-        db.add(survey)
-        db.flush()
-
-    # Create answers
-    for answer_data in answers:
-        answer = SurveyAnswer(
-            submission_id=submission.id,
-            survey_id=survey.id,
-            question_code=answer_data.question_code,
-            question_text=answer_data.question_text,
-            numeric_value=answer_data.numeric_value,
-            text_value=answer_data.text_value
+    submission_id, submitted_at = result.one()
+
+    if answers:
+        await db.execute(
+            insert(SurveyAnswer).values([
+                {
+                    "submission_id": submission_id,
+                    "survey_id": survey_id,
+                    "question_code": answer.question_code,
+                    "question_text": answer.question_text,
+                    "numeric_value": answer.numeric_value,
+                    "text_value": answer.text_value
+                }
+                for answer in answers
+            ])
         )
-        db.add(answer)
 
-    db.commit()
-    db.refresh(submission)
+    # Keep per-question aggregates in step, in the same transaction
+    if group_id is not None:
+        await record_submission_stats(db, group_id, answers, submitted_at)
 
-    return submission
+    await db.commit()
+    await bump_statistics_version(group_id)
 
-def get_group_statistics(db: Session, group_id: int):
-    """Calculate statistics for a group"""
-    # Get all submissions for this group's links
-    links = db.query(SurveyLink).filter(SurveyLink.group_id == group_id).all()
-    link_ids = [link.id for link in links]
+    return submission_id
 
-    if not link_ids:
-        return []
+def _stats_from_rows(rows, percentiles: dict) -> list:
+    stats = []
+    for row in rows:
+        if not row.count:
+            continue
+        stat = question_stat_from_aggregate(row.question_code, row.count, row.sum, row.sum_squares, row.min, row.max)
+        # Median and quartiles come from the merged value histograms
+        question_percentiles = percentiles.get(row.question_code, {})
+        for name in ("median", "q1", "q3"):
+            stat[name] = question_percentiles.get(name)
+        stats.append(stat)
+    return stats
 
-    # Get all answers
-    answers = db.query(SurveyAnswer).join(SurveySubmission).filter(
-        SurveySubmission.survey_link_id.in_(link_ids)
-    ).all()
+async def get_group_statistics(db: AsyncSession, group_id: int):
+    """Calculate statistics for a group from the maintained per-question aggregates"""
+    result = await db.execute(
+        select(GroupQuestionStats)
+        .where(GroupQuestionStats.group_id == group_id)
+        .order_by(GroupQuestionStats.question_code)
+    )
+    rows = result.scalars().all()
+    percentiles = await get_percentiles_by_group(db, Group.id == group_id)
+    return _stats_from_rows(rows, percentiles.get(group_id, {}))
 
-    # Group by question_code
-    stats_by_question = {}
-    for answer in answers:
-        if answer.numeric_value is not None:
-            if answer.question_code not in stats_by_question:
-                stats_by_question[answer.question_code] = []
-            stats_by_question[answer.question_code].append(answer.numeric_value)
+async def get_statistics_by_group(db: AsyncSession, *criteria) -> dict:
+    """Question statistics for every group matching `criteria`, keyed by group id.
 
-    # Calculate statistics
-    result = []
-    for question_code, values in stats_by_question.items():
-        if values:
-            result.append({
-                "question_code": question_code,
-                "average": sum(values) / len(values),
-                "count": len(values),
-                "min": min(values),
-                "max": max(values)
-            })
+    One query over the per-question aggregates regardless of the number of
+    groups; `criteria` may filter on Group columns.
+    """
+    result = await db.execute(
+        select(GroupQuestionStats)
+        .join(Group, Group.id == GroupQuestionStats.group_id)
+        .where(*criteria)
+        .order_by(GroupQuestionStats.group_id, GroupQuestionStats.question_code)
+    )
 
-    return result
+    rows_by_group = {}
+    for row in result.scalars():
+        rows_by_group.setdefault(row.group_id, []).append(row)
+
+    percentiles = await get_percentiles_by_group(db, *criteria)
+    return {
+        group_id: _stats_from_rows(rows, percentiles.get(group_id, {}))
+        for group_id, rows in rows_by_group.items()
+    }
+
+async def get_group_validator(db: AsyncSession, group_id: int):
+    """Cheap change marker of a group's statistics, None if the group doesn't exist.
+
+    Newest submission id, the aggregate row count and last update, plus
+    the group's and faculty's updated_at, in one query that doesn't touch
+    answers. The aggregates matter in write-behind mode: queued submissions
+    carry ids from before their batch commits, so the newest id alone can
+    stay the same while rows land.
+    """
+    aggregates = (
+        select(
+            func.sum(GroupQuestionStats.count).label("answer_count"),
+            func.max(GroupQuestionStats.updated_at).label("updated_at")
+        )
+        .where(GroupQuestionStats.group_id == group_id)
+        .subquery()
+    )
+    latest = (
+        select(func.max(SurveySubmission.id).label("submission_id"))
+        .join(SurveyLink, SurveyLink.id == SurveySubmission.survey_link_id)
+        .where(SurveyLink.group_id == group_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(
+            Group.id,
+            Group.updated_at,
+            Faculty.updated_at.label("faculty_updated_at"),
+            latest.c.submission_id,
+            aggregates.c.answer_count,
+            aggregates.c.updated_at.label("stats_updated_at")
+        )
+        .outerjoin(Faculty, Faculty.id == Group.faculty_id)
+        .join(latest, literal(True))
+        .join(aggregates, literal(True))
+        .where(Group.id == group_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    return _validator(
+        (row.id, row.submission_id, row.answer_count, row.stats_updated_at, row.updated_at, row.faculty_updated_at),
+        row.stats_updated_at, row.updated_at, row.faculty_updated_at
+    )
+
+async def get_statistics_validator(db: AsyncSession):
+    """Cheap change marker of the statistics of all groups (index-only and small-table aggregates)"""
+    # max(id) reads the primary key index; submitted_at has none, so Last-Modified
+    # comes from the aggregates instead
+    submissions = select(func.max(SurveySubmission.id).label("submission_id")).subquery()
+    aggregates = select(
+        func.sum(GroupQuestionStats.count).label("answer_count"),
+        func.max(GroupQuestionStats.updated_at).label("updated_at")
+    ).subquery()
+    groups = select(
+        func.count(Group.id).label("count"), func.max(Group.updated_at).label("updated_at")
+    ).subquery()
+    faculties = select(
+        func.count(Faculty.id).label("count"), func.max(Faculty.updated_at).label("updated_at")
+    ).subquery()
+    row = (await db.execute(
+        select(
+            submissions.c.submission_id,
+            aggregates.c.answer_count,
+            aggregates.c.updated_at.label("stats_updated_at"),
+            groups.c.count.label("group_count"),
+            groups.c.updated_at.label("group_updated_at"),
+            faculties.c.count.label("faculty_count"),
+            faculties.c.updated_at.label("faculty_updated_at")
+        )
+    )).one()
+    return _validator(
+        tuple(row), row.stats_updated_at, row.group_updated_at, row.faculty_updated_at
+    )
+
+def _validator(parts: tuple, *timestamps) -> tuple:
+    """(ETag, Last-Modified) of a validator"""
+    known = [moment for moment in timestamps if moment is not None]
+    return make_etag(*parts), max(known) if known else None
+
+async def get_groups_overview(db: AsyncSession, *criteria):
+    """Groups matching `criteria` with faculty name and submission count, in one query"""
+    submission_counts = (
+        select(SurveyLink.group_id, func.count(SurveySubmission.id).label("total_submissions"))
+        .join(SurveySubmission, SurveySubmission.survey_link_id == SurveyLink.id)
+        .group_by(SurveyLink.group_id)
+        .subquery()
+    )
+
+    result = await db.execute(
+        select(
+            Group.id,
+            Group.name,
+            Group.year,
+            Group.faculty_id,
+            Faculty.name.label("faculty_name"),
+            func.coalesce(submission_counts.c.total_submissions, 0).label("total_submissions")
+        )
+        .outerjoin(Faculty, Faculty.id == Group.faculty_id)
+        .outerjoin(submission_counts, submission_counts.c.group_id == Group.id)
+        .where(*criteria)
+        .order_by(Group.id)
+    )
+    return result.all()
+
+async def count_group_submissions(db: AsyncSession, group_id: int) -> int:
+    """Count submissions made through any of the group's links"""
+    return await db.scalar(
+        select(func.count(SurveySubmission.id))
+        .join(SurveyLink, SurveyLink.id == SurveySubmission.survey_link_id)
+        .where(SurveyLink.group_id == group_id)
+    )
 
-def get_all_group_statistics(db: Session):
+async def get_all_group_statistics(db: AsyncSession):
     """Get statistics for all groups"""
-    groups = db.query(Group).all()
+    result = await db.execute(select(Group).options(joinedload(Group.faculty)))
+    groups = result.scalars().all()
 
     result = []
     for group in groups:
-        stats = get_group_statistics(db, group.id)
+        stats = await get_group_statistics(db, group.id)
         total_submissions = len(stats[0]['values']) if stats and stats[0].get('values') else 0
 
         result.append({
@@ -0,0 +1,26 @@
+import os
+
+# Settings and engines are created at import time. Tests that touch the database
+# run against TEST_DATABASE_URL only (a scratch PostgreSQL database: its tables are
+# dropped and recreated); everything else never connects.
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", "postgresql+psycopg2://test@localhost/test")
+
+import pytest
+
+
+class FakeClock:
+    """Stands in for the `time` module of code that measures intervals with time.monotonic()"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
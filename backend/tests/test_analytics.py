@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from services.analytics_service import CONFIDENCE_Z, moments, rank_columns
+
+
+def _sums(samples: list) -> tuple:
+    count = np.array([float(len(values)) for values in samples])
+    total = np.array([float(sum(values)) for values in samples])
+    sum_squares = np.array([float(sum(v * v for v in values)) for values in samples])
+    return count, total, sum_squares
+
+
+def test_moments_match_sample_statistics():
+    samples = [[1, 2, 3, 4], [5, 5, 6], [2, 9]]
+    result = moments(*_sums(samples))
+
+    for i, values in enumerate(samples):
+        std = np.std(values, ddof=1)
+        stderr = std / np.sqrt(len(values))
+        assert result["mean"][i] == pytest.approx(np.mean(values))
+        assert result["std"][i] == pytest.approx(std)
+        assert result["ci_low"][i] == pytest.approx(np.mean(values) - CONFIDENCE_Z * stderr)
+        assert result["ci_high"][i] == pytest.approx(np.mean(values) + CONFIDENCE_Z * stderr)
+
+
+def test_moments_are_nan_where_undefined():
+    result = moments(*_sums([[], [4]]))
+    assert np.isnan(result["mean"][0])
+    assert result["mean"][1] == 4
+    assert np.isnan(result["std"]).all()
+
+
+def test_moments_clamp_rounding_below_zero():
+    # Identical values whose running sums came out a hair below sum * mean
+    result = moments(np.array([3.0]), np.array([0.3]), np.array([0.03 - 1e-15]))
+    assert result["std"][0] == 0.0
+
+
+def test_rank_columns_highest_first_per_column():
+    values = np.array([
+        [1.0, 9.0],
+        [3.0, np.nan],
+        [2.0, 7.0],
+    ])
+    assert rank_columns(values).tolist() == [[3, 1], [1, 0], [2, 2]]
+
+
+def test_rank_columns_ties_keep_row_order():
+    values = np.array([[5.0], [5.0], [6.0]])
+    assert rank_columns(values).tolist() == [[2], [3], [1]]
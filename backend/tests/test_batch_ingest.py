@@ -0,0 +1,31 @@
+import io
+
+from app.api.surveys import MAX_BATCH_LINE_BYTES, _ndjson_lines
+
+
+def _lines(data: bytes) -> list:
+    return list(_ndjson_lines(io.BytesIO(data)))
+
+
+def test_numbers_lines_and_skips_blank_ones():
+    data = b'{"a": 1}\n\n   \n{"b": 2}\n{"c": 3}'
+    assert _lines(data) == [(1, b'{"a": 1}\n'), (4, b'{"b": 2}\n'), (5, b'{"c": 3}')]
+
+
+def test_overlong_line_is_reported_and_skipped():
+    long_line = b"x" * (MAX_BATCH_LINE_BYTES * 3) + b"\n"
+    data = b'{"a": 1}\n' + long_line + b'{"b": 2}\n'
+    assert _lines(data) == [(1, b'{"a": 1}\n'), (2, None), (3, b'{"b": 2}\n')]
+
+
+def test_line_at_the_limit_is_kept():
+    line = b"x" * (MAX_BATCH_LINE_BYTES - 1) + b"\n"
+    assert _lines(line) == [(1, line)]
+
+
+def test_overlong_last_line_without_newline():
+    assert _lines(b"x" * (MAX_BATCH_LINE_BYTES + 10)) == [(1, None)]
+
+
+def test_empty_body():
+    assert _lines(b"") == []
@@ -0,0 +1,57 @@
+import math
+
+import pytest
+
+from services.distribution_service import (
+    SKETCH_RELATIVE_ACCURACY, histogram_bin, percentiles_from_histogram, usable_numeric_value
+)
+
+
+@pytest.mark.parametrize("value", [0.0, 1.0, 5.0, -3.0, 1e6])
+def test_integers_are_kept_exactly(value):
+    assert histogram_bin(value) == value
+
+
+@pytest.mark.parametrize("value", [0.001, 0.37, 2.5, 3.14159, 123.456, 98765.4321, -4.2])
+def test_other_values_stay_within_relative_accuracy(value):
+    binned = histogram_bin(value)
+    assert math.copysign(1, binned) == math.copysign(1, value)
+    assert abs(binned - value) <= SKETCH_RELATIVE_ACCURACY * abs(value)
+
+
+def test_close_values_share_a_bin():
+    assert histogram_bin(2.5) == histogram_bin(2.5001)
+    assert histogram_bin(2.5) != histogram_bin(2.6)
+
+
+def test_percentiles_interpolate_between_values():
+    bins = [(1.0, 1), (2.0, 1), (3.0, 1), (4.0, 1), (5.0, 1)]
+    result = percentiles_from_histogram(bins)
+    assert result["median"] == 3.0
+    assert result["q1"] == 2.0
+    assert result["q3"] == 4.0
+    assert result["p10"] == pytest.approx(1.4)
+    assert result["p90"] == pytest.approx(4.6)
+
+
+def test_percentiles_respect_bin_counts():
+    # Values 1, 1, 1, 5: q3 sits a quarter of the way from the third to the fourth
+    result = percentiles_from_histogram([(1.0, 3), (5.0, 1)])
+    assert result["median"] == 1.0
+    assert result["q3"] == pytest.approx(2.0)
+
+
+def test_percentiles_of_one_value():
+    result = percentiles_from_histogram([(4.0, 7)])
+    assert set(result.values()) == {4.0}
+
+
+def test_percentiles_of_empty_histogram():
+    assert set(percentiles_from_histogram([]).values()) == {None}
+
+
+@pytest.mark.parametrize("value, usable", [
+    (3.0, True), (-1e9, True), (None, False), (math.nan, False), (math.inf, False), (2e9, False)
+])
+def test_usable_numeric_value(value, usable):
+    assert usable_numeric_value(value) is usable
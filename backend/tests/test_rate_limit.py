@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from core import rate_limit
+from core.rate_limit import TokenBucketLimiter
+
+
+@pytest.fixture
+def limiter(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "time", clock)
+    # One token per second, bursts of three
+    return TokenBucketLimiter("test", rate=1, burst=3, maxsize=100)
+
+
+def _acquire(limiter, key, cost=1):
+    return asyncio.run(limiter.acquire(key, cost))
+
+
+def test_burst_then_limited(limiter):
+    assert [_acquire(limiter, "a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert _acquire(limiter, "a") == pytest.approx(1.0)
+    assert limiter.stats()["allowed"] == 3
+    assert limiter.stats()["limited"] == 1
+
+
+def test_tokens_refill_at_rate(limiter, clock):
+    for _ in range(3):
+        _acquire(limiter, "a")
+    clock.advance(0.5)
+    assert _acquire(limiter, "a") == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert _acquire(limiter, "a") == 0.0
+
+
+def test_keys_are_independent(limiter):
+    for _ in range(3):
+        _acquire(limiter, "a")
+    assert _acquire(limiter, "a") > 0
+    assert _acquire(limiter, "b") == 0.0
+
+
+def test_cost_larger_than_available_takes_nothing(limiter, clock):
+    assert _acquire(limiter, "a", cost=2) == 0.0
+    assert _acquire(limiter, "a", cost=2) == pytest.approx(1.0)
+    # The refused request did not spend the remaining token
+    assert _acquire(limiter, "a") == 0.0
+
+
+def test_idle_keys_are_dropped(limiter, clock):
+    _acquire(limiter, "a")
+    clock.advance(3)
+    _acquire(limiter, "b")
+    assert limiter.stats()["keys"] == 1
+
+
+def test_least_recently_used_key_is_evicted(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "time", clock)
+    limiter = TokenBucketLimiter("test", rate=1, burst=3, maxsize=2)
+    for key in ("a", "b", "a", "c"):
+        _acquire(limiter, key)
+
+    assert list(limiter._buckets) == ["a", "c"]
+    assert limiter.stats()["evictions"] == 1
@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+
+from core import resilience
+from core.resilience import CircuitBreaker, CircuitOpenError, RefreshingValue
+
+
+@pytest.fixture
+def breaker(clock, monkeypatch):
+    monkeypatch.setattr(resilience, "time", clock)
+    return CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+
+
+async def _ok():
+    return "ok"
+
+
+async def _fail():
+    raise RuntimeError("upstream down")
+
+
+def test_breaker_opens_after_consecutive_failures(breaker):
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected_total"] == 1
+
+
+def test_success_resets_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 1
+
+
+def test_half_open_lets_one_trial_through(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(30)
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(30)
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()["opened_total"] == 2
+    clock.advance(29)
+    assert not breaker.allow()
+
+
+def test_call_counts_exceptions_and_failed_results(breaker):
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await breaker.call(_fail)
+        assert await breaker.call(_ok, is_failure=lambda result: result == "ok") == "ok"
+        assert breaker.consecutive_failures == 2
+        with pytest.raises(RuntimeError):
+            await breaker.call(_fail)
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(_ok)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_trial_frees_half_open_slot(breaker, clock):
+    async def scenario():
+        for _ in range(3):
+            breaker.record_failure()
+        clock.advance(30)
+
+        task = asyncio.create_task(breaker.call(asyncio.Event().wait))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # Not counted as a failure, and the next caller gets the trial
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert await breaker.call(_ok) == "ok"
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+class _Upstream:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.release = None
+
+    async def fetch(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        if self.fail:
+            raise RuntimeError("unreachable")
+        return self.calls
+
+
+def test_refreshing_value_serves_fresh_value_without_fetching():
+    async def scenario():
+        upstream = _Upstream()
+        value = RefreshingValue("doc", upstream.fetch, ttl=60, max_staleness=600)
+        assert await value.get() == 1
+        assert await value.get() == 1
+        assert upstream.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_refreshing_value_serves_stale_while_refreshing_once():
+    async def scenario():
+        upstream = _Upstream()
+        value = RefreshingValue("doc", upstream.fetch, ttl=60, max_staleness=600)
+        await value.get()
+        value.fetched_at -= 120
+        upstream.release = asyncio.Event()
+
+        # Both callers get the stale value; a single refresh runs in the background
+        assert await value.get() == 1
+        assert await value.get() == 1
+        await asyncio.sleep(0)
+        assert upstream.calls == 2
+
+        upstream.release.set()
+        await value._refresh_task
+        assert await value.get() == 2
+        assert value.stats()["stale_served"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_refreshing_value_waits_when_too_stale_and_keeps_value_on_failure():
+    async def scenario():
+        upstream = _Upstream()
+        value = RefreshingValue("doc", upstream.fetch, ttl=60, max_staleness=600)
+        await value.get()
+        value.fetched_at -= 1200
+
+        upstream.fail = True
+        with pytest.raises(RuntimeError):
+            await value.get()
+        assert value.value == 1
+        assert value.stats()["refresh_failures"] == 1
+
+        upstream.fail = False
+        assert await value.get() == 3
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_refreshes_are_collapsed():
+    async def scenario():
+        upstream = _Upstream()
+        upstream.release = asyncio.Event()
+        value = RefreshingValue("doc", upstream.fetch, ttl=60, max_staleness=600)
+
+        waiters = [asyncio.create_task(value.get()) for _ in range(5)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        assert await asyncio.gather(*waiters) == [1] * 5
+        assert upstream.calls == 1
+
+    asyncio.run(scenario())
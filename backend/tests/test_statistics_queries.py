@@ -0,0 +1,107 @@
+"""Query budgets of the statistics endpoints, against a scratch PostgreSQL database"""
+import asyncio
+import os
+
+import httpx
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("TEST_DATABASE_URL"), reason="set TEST_DATABASE_URL to a scratch PostgreSQL database"
+)
+
+from app.models import Faculty, Group
+from app.schemas import SurveyAnswerCreate
+from core.database import AsyncSessionLocal, Base, async_engine, engine
+from core.query_counter import count_queries, install_query_counter
+from main import app
+from services.link_service import create_group_links
+from services.survey_service import create_submission, get_group_survey_id
+
+# Validator, groups overview, question aggregates, histogram percentiles
+ALL_STATISTICS_BUDGET = 4
+
+
+@pytest.fixture(autouse=True)
+def database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    install_query_counter(engine, async_engine.sync_engine)
+    yield
+    engine.dispose()
+
+
+async def _seed_groups(faculty_name: str, count: int, submissions_per_group: int = 2):
+    async with AsyncSessionLocal() as db:
+        faculty = Faculty(name=faculty_name)
+        db.add(faculty)
+        await db.flush()
+        groups = [Group(name=f"{faculty_name}-{i}", faculty_id=faculty.id, year=1 + i % 4) for i in range(count)]
+        db.add_all(groups)
+        await db.commit()
+
+        links = await create_group_links(db, [group.id for group in groups])
+        for link in links:
+            survey_id = await get_group_survey_id(db, link.group_id)
+            for i in range(submissions_per_group):
+                answers = [
+                    SurveyAnswerCreate(question_code="comfort", question_text="Comfort", numeric_value=1 + i % 5),
+                    SurveyAnswerCreate(question_code="stress", question_text="Stress", numeric_value=2.5 + i),
+                ]
+                await create_submission(db, link.id, link.group_id, survey_id, answers)
+
+
+def _run(scenario):
+    """Run a test body on its own event loop; pooled asyncpg connections are bound to it"""
+    async def run():
+        try:
+            await scenario()
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+async def _get(client: httpx.AsyncClient, url: str, **kwargs):
+    with count_queries() as stats:
+        response = await client.get(url, **kwargs)
+    return response, stats
+
+
+def test_all_statistics_query_count_does_not_grow_with_groups():
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await _seed_groups("Physics", 2)
+            response, few = await _get(client, "/api/admin/statistics/all")
+            assert response.status_code == 200
+            assert response.json()["overall"]["total_groups"] == 2
+
+            await _seed_groups("Chemistry", 12)
+            response, many = await _get(client, "/api/admin/statistics/all")
+            assert response.status_code == 200
+            assert response.json()["overall"]["total_groups"] == 14
+
+        assert few.count <= ALL_STATISTICS_BUDGET
+        assert many.count == few.count, many.repeated(1)
+
+    _run(scenario)
+
+
+def test_all_statistics_repeat_costs_only_the_validator():
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await _seed_groups("Biology", 3)
+            response, _ = await _get(client, "/api/admin/statistics/all")
+            etag = response.headers["ETag"]
+
+            # Served from the statistics cache
+            response, cached = await _get(client, "/api/admin/statistics/all")
+            assert response.status_code == 200
+            assert cached.count == 1
+
+            response, revalidated = await _get(client, "/api/admin/statistics/all", headers={"If-None-Match": etag})
+            assert response.status_code == 304
+            assert revalidated.count == 1
+
+    _run(scenario)